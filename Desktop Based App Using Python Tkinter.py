@@ -1,89 +1,32 @@
 # NVIT_management_system.py
 import tkinter as tk
-from tkinter import ttk, messagebox
-import sqlite3, hashlib
+from tkinter import ttk, messagebox, filedialog
+import sqlite3, hashlib, logging, os
+from nvit_db import Q, LISTS, LOOKUPS, open_db, migrate, fetch_all, run_query, export_csv, global_search, find_phone, sync_search, DBExecutor, TkDispatcher, DatabaseBusy, Tracer
+from nvit_widgets import VirtualTree, Picker, WindowPool, LazyNotebook, SearchBox
 
 DB = "nvit_system.db"
+# Set NVIT_MULTI_USER=1 on every front-desk PC that shares one database file.
+MULTI_USER = os.environ.get("NVIT_MULTI_USER") == "1"
+# Statements slower than NVIT_SLOW_MS go to nvit_slow.log; NVIT_SQL_ECHO=1 logs every statement.
+SLOW_MS = int(os.environ.get("NVIT_SLOW_MS", "200"))
+# NVIT_TABS=1 opens Students, Courses, Instructors and Results as tabs of the dashboard.
+TABS = os.environ.get("NVIT_TABS") == "1"
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
 
 
 # -------------------------Database Setup -------------------------
 
-def get_conn():
-    conn = sqlite3.connect(DB)
-    conn.execute("PRAGMA foreign_keys = ON")
-    return conn
+db = open_db(DB, concurrent=MULTI_USER,
+             tracer=Tracer(SLOW_MS, "nvit_slow.log", echo=os.environ.get("NVIT_SQL_ECHO") == "1"))
 
 def init_db():
-    conn = get_conn()
-    c = conn.cursor()
-
-    # -------------------------Create Users Table -------------------------
-    c.execute("""CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL
-    )""")
-
-    # -------------------------Create Course  Table -------------------------
-    c.execute("""CREATE TABLE IF NOT EXISTS Course (
-        course_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        course_name TEXT NOT NULL UNIQUE,
-        duration TEXT NOT NULL,
-        course_price REAL
-    )""")
-
-    # -------------------------Create Instructors  Table -------------------------
-    c.execute("""CREATE TABLE IF NOT EXISTS Instructors (
-        instructor_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        father_name TEXT,
-        mother_name TEXT,
-        blood_group TEXT,
-        mobile_no TEXT,
-        expertise TEXT
-    )""")
-
-    # -------------------------Create Student  Table -------------------------
-    c.execute("""CREATE TABLE IF NOT EXISTS Student (
-        student_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        father_name TEXT,
-        mother_name TEXT,
-        address TEXT,
-        blood_group TEXT,
-        mobile_no TEXT,
-        course_id INTEGER,
-        instructor_id INTEGER,
-        batch_no TEXT,
-        FOREIGN KEY(course_id) REFERENCES Course(course_id) ON DELETE SET NULL,
-        FOREIGN KEY(instructor_id) REFERENCES Instructors(instructor_id) ON DELETE SET NULL
-    )""")
-
-    # -------------------------Create Result Table -------------------------
-    c.execute("""CREATE TABLE IF NOT EXISTS Result (
-        result_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        student_id INTEGER,
-        course_id INTEGER,
-        grade TEXT,
-        instructor_id INTEGER,
-        FOREIGN KEY(student_id) REFERENCES Student(student_id) ON DELETE CASCADE,
-        FOREIGN KEY(course_id) REFERENCES Course(course_id) ON DELETE SET NULL,
-        FOREIGN KEY(instructor_id) REFERENCES Instructors(instructor_id) ON DELETE SET NULL
-    )""")
-    conn.commit(); conn.close()
+    with db.writer() as conn:
+        migrate(conn)
+    sync_search()  # names written by other clients since the last run
 
 init_db()
 
-
-# -------------------------DB helpers -------------------------
-def fetch_all(q, p=()):
-    conn = get_conn(); cur = conn.cursor(); cur.execute(q, p)
-    rows = cur.fetchall(); conn.close(); return rows
-
-def run_query(q, p=()):
-    conn = get_conn(); cur = conn.cursor(); cur.execute(q, p)
-    conn.commit(); conn.close()
 # ------------------------- Password hashing -----------------------
 
 def hash_password(pwd):
@@ -130,6 +73,25 @@ def center(win, w=800, h=600):
     sw = win.winfo_screenwidth(); sh = win.winfo_screenheight()
     x = (sw//2) - (w//2); y = (sh//2) - (h//2)
     win.geometry(f"{w}x{h}+{x}+{y}")
+
+def toplevel(kind):
+    text, title, (w, h), build, prefetch = SCREENS[kind]
+    win = tk.Toplevel(root); win.title(title)
+    center(win, w, h); win.configure(bg='#E3F2FD')
+    return win
+
+def report_error(exc, val, tb):
+    if isinstance(val, DatabaseBusy):
+        messagebox.showwarning("Database busy", "Another computer is saving to the database right now.\nPlease try again in a moment.")
+    else:
+        tk.Tk.report_callback_exception(root, exc, val, tb)
+
+def export_list(owner, q, header, name):
+    path = filedialog.asksaveasfilename(parent=owner, defaultextension=".csv", initialfile=f"{name}.csv",
+                                        filetypes=[("CSV files", "*.csv")])
+    if not path: return
+    dispatcher.submit(export_csv, path, q, (), header, owner=owner,
+                      on_done=lambda n: messagebox.showinfo("Export", f"Exported {n} rows to {path}", parent=owner))
 # ------------------------- Register window  -----------------------
 def open_register():
     reg = tk.Toplevel(root); reg.title("Register - NVIT")
@@ -147,7 +109,7 @@ def open_register():
         if not (name and email and pwd):
             messagebox.showwarning("Validation", "All fields required"); return
         try:
-            run_query("INSERT INTO users (name,email,password) VALUES (?,?,?)", (name,email,hash_password(pwd)))
+            run_query(Q("users.insert"), (name,email,hash_password(pwd)))
             messagebox.showinfo("Success", "Registration successful"); reg.destroy()
         except sqlite3.IntegrityError:
             messagebox.showerror("Error", "Email already registered")
@@ -160,30 +122,61 @@ def login_user():
     if not (email and pwd):
         messagebox.showwarning("Validation", "Email and Password required"); return
     hashed = hash_password(pwd)
-    user = fetch_all("SELECT id,name FROM users WHERE email=? AND password=?", (email, hashed))
+    user = fetch_all(Q("users.login"), (email, hashed))
     if user:
-        messagebox.showinfo("Welcome", f"Welcome {user[0][1]}!"); open_dashboard()
+        messagebox.showinfo("Welcome", f"Welcome {user[0][1]}!"); windows.show("dashboard", open_dashboard)
     else:
         messagebox.showerror("Error", "Invalid email or password")
 
 # ------------------------- Dashboard  -----------------------
 def open_dashboard():
     dash = tk.Toplevel(root); dash.title(" New Vision IT Ltd")
-    center(dash, 720, 420); dash.configure(bg='#E3F2FD')
+    center(dash, *((1000, 700) if TABS else (720, 600))); dash.configure(bg='#E3F2FD')
     main = ttk.Frame(dash, padding=12); main.pack(expand=True, fill='both')
     ttk.Label(main, text="NVIT Dashboard", style='Header.TLabel').pack(fill='x', pady=(0,12))
+    if TABS:
+        book = LazyNotebook(main, dispatcher); book.pack(expand=True, fill='both')
+        home = ttk.Frame(book); book.add(home, text=" Home")
+        for kind, (text, title, size, build, prefetch) in SCREENS.items():
+            book.add_lazy(kind, text, build, prefetch)
+        main = home; show = book.show
+        book.prefetch_next()
+    else:
+        show = lambda kind: windows.show(kind, SCREENS[kind][3])
     ttk.Label(main, text="Welcome To New Vision IT Ltd", style='Title.TLabel',font=("Helvetica", 20, "bold"),foreground="#0D47A1").pack(pady=(4,10))
     btn_frame = ttk.Frame(main); btn_frame.pack(pady=18)
-    ttk.Button(btn_frame, text=" Students", width=20, style='Primary.TButton', command=open_students).grid(row=0,column=0,padx=10,pady=8)
-    ttk.Button(btn_frame, text=" Courses", width=20, style='Primary.TButton', command=open_courses).grid(row=0,column=1,padx=10,pady=8)
-    ttk.Button(btn_frame, text=" Instructors", width=20, style='Primary.TButton', command=open_instructors).grid(row=1,column=0,padx=10,pady=8)
-    ttk.Button(btn_frame, text=" Results", width=20, style='Primary.TButton', command=open_results).grid(row=1,column=1,padx=10,pady=8)
+    for i, kind in enumerate(SCREENS):
+        ttk.Button(btn_frame, text=SCREENS[kind][0], width=20, style='Primary.TButton',
+                   command=lambda k=kind: show(k)).grid(row=i // 2, column=i % 2, padx=10, pady=8)
     ttk.Label(main, text="Click On the Button", style='Sub.TLabel').pack(pady=8)
+    # global search: a few hits per kind; opening one jumps to the record in its window
+    search_f = ttk.Frame(main); search_f.pack(fill='x', padx=40, pady=(8,4))
+    ttk.Label(search_f, text="Search everything:").pack(side='left')
+    hits = ttk.Treeview(main, show='tree', height=8, selectmode='browse'); seq = [0]
+    def find(text, search=global_search):
+        seq[0] += 1; n = seq[0]
+        if not text.strip(): return show_hits({})
+        dispatcher.submit(search, text, on_done=lambda found: n == seq[0] and show_hits(found), owner=dash)
+    def show_hits(found):
+        hits.delete(*hits.get_children())
+        for kind, rows in found.items():
+            group = hits.insert("", "end", text=f"{SCREENS[kind][0].strip()} ({len(rows)})", open=True)
+            for key, label in rows: hits.insert(group, "end", iid=f"{kind}:{key}", text=label)
+        if found: hits.pack(fill='both', expand=True, padx=40, pady=(0,8))
+        else: hits.pack_forget()
+    def open_hit(e=None):
+        sel = hits.selection()
+        if not sel or ":" not in sel[0]: return
+        kind, key = sel[0].split(":"); show(kind); jump_to[kind](int(key))
+    hits.bind("<Double-1>", open_hit); hits.bind("<Return>", open_hit)
+    SearchBox(search_f, find, width=50).pack(side='left', fill='x', expand=True, padx=6)
+    ttk.Label(search_f, text="Caller (last 4+ digits):").pack(side='left', padx=(12,0))
+    SearchBox(search_f, lambda text: find(text, find_phone), width=16).pack(side='left', padx=6)
+    return dash
 # ------------------------- Courses  -----------------------
 
-def open_courses():
-    win = tk.Toplevel(root); win.title("Manage Courses")
-    center(win, 660, 480); win.configure(bg='#E3F2FD')
+def open_courses(win=None):
+    if win is None: win = toplevel("courses")
     frm = ttk.Frame(win, padding=12); frm.pack(expand=True, fill='both')
     ttk.Label(frm, text="Courses", style='Header.TLabel').pack(fill='x', pady=(0,10))
     form = ttk.Frame(frm); form.pack(fill='x', pady=6)
@@ -194,61 +187,60 @@ def open_courses():
     ttk.Label(form, text="Price:").grid(row=2,column=0, sticky='w', padx=6, pady=6)
     cprice = ttk.Entry(form, width=40); cprice.grid(row=2,column=1, padx=6, pady=6)
     cols = ("ID","Course Name","Duration","Price")
-    tree = ttk.Treeview(frm, columns=cols, show='headings', height=9)
-    for c in cols: tree.heading(c, text=c); tree.column(c, anchor='center')
+    tree = VirtualTree(frm, cols, LISTS["courses"].view(), dispatcher, height=9)
     tree.pack(fill='both', padx=6, pady=8)
     def load():
-        tree.delete(*tree.get_children())
-        for r in fetch_all("SELECT course_id, course_name, duration, course_price FROM Course ORDER BY course_id"):
-            tree.insert("", "end", values=r)
+        tree.refresh()
     def clear_form():
         cname.delete(0,tk.END); cdur.delete(0,tk.END); cprice.delete(0,tk.END)
+    def saved(patch, key=None):
+        def done(new_key):
+            patch(new_key if key is None else key); clear_form()
+        return done
+    def save_failed(e):
+        if not isinstance(e, sqlite3.IntegrityError): raise e
+        messagebox.showerror("Error", "Course name must be unique")
     def add():
         n = cname.get().strip(); d = cdur.get().strip(); p = cprice.get().strip()
         if not (n and d): messagebox.showwarning("Validation", "Name & Duration required"); return
-        try:
-            run_query("INSERT INTO Course (course_name,duration,course_price) VALUES (?,?,?)", (n,d, float(p) if p else None))
-            load(); clear_form()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "Course name must be unique")
+        dispatcher.submit(run_query, Q("courses.insert"), (n,d, float(p) if p else None),
+                          on_done=saved(tree.added), on_error=save_failed, owner=win)
     def on_select(e=None):
-        sel = tree.focus();
-        if not sel: return
-        vals = tree.item(sel,'values')
+        vals = tree.selected()
+        if not vals: return
         cname.delete(0,tk.END); cname.insert(0, vals[1])
         cdur.delete(0,tk.END); cdur.insert(0, vals[2])
         cprice.delete(0,tk.END); cprice.insert(0, vals[3] if vals[3] is not None else '')
     def update_rec():
-        sel = tree.focus()
+        sel = tree.selected_key()
         if not sel: messagebox.showwarning("Select", "Select course to update"); return
-        cid = tree.item(sel,'values')[0]
+        cid = sel
         n = cname.get().strip(); d = cdur.get().strip(); p = cprice.get().strip()
         if not (n and d): messagebox.showwarning("Validation", "Name & Duration required"); return
-        try:
-            run_query("UPDATE Course SET course_name=?,duration=?,course_price=? WHERE course_id=?", (n,d, float(p) if p else None, cid))
-            load(); clear_form()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "Course name must be unique")
+        dispatcher.submit(run_query, Q("courses.update"), (n,d, float(p) if p else None, cid),
+                          on_done=saved(tree.changed, cid), on_error=save_failed, owner=win)
     def delete_rec():
-        sel = tree.focus()
+        sel = tree.selected_key()
         if not sel: messagebox.showwarning("Select", "Select course to delete"); return
-        cid = tree.item(sel,'values')[0]
+        cid = sel
         if messagebox.askyesno("Confirm", "Delete this course? Related students will set course to NULL."):
-            run_query("DELETE FROM Course WHERE course_id=?", (cid,)); load(); clear_form()
+            dispatcher.submit(run_query, Q("courses.delete"), (cid,), on_done=saved(tree.removed, cid), owner=win)
     btnf = ttk.Frame(frm); btnf.pack(fill='x', pady=6)
     ttk.Button(btnf, text="Add", style='Primary.TButton', command=add).pack(side='left', padx=6)
     ttk.Button(btnf, text="Update", style='Success.TButton', command=update_rec).pack(side='left', padx=6)
     ttk.Button(btnf, text="Delete", style='Danger.TButton', command=delete_rec).pack(side='left', padx=6)
     ttk.Button(btnf, text="Clear", command=clear_form).pack(side='left', padx=6)
     ttk.Button(btnf, text="Refresh", command=load).pack(side='right', padx=6)
-    tree.bind("<<TreeviewSelect>>", on_select); load()
+    ttk.Button(btnf, text="Export CSV", command=lambda: export_list(win, Q("courses.list"), cols, "courses")).pack(side='right', padx=6)
+    tree.bind("<<ListSelect>>", on_select); load()
+    jump_to["courses"] = tree.reveal
+    return win
 
 
 # ------------------------- Instructors  -----------------------
 
-def open_instructors():
-    win = tk.Toplevel(root); win.title("Manage Instructors")
-    center(win, 820, 520); win.configure(bg='#E3F2FD')
+def open_instructors(win=None):
+    if win is None: win = toplevel("instructors")
     frm = ttk.Frame(win, padding=12); frm.pack(expand=True, fill='both')
     ttk.Label(frm, text="Instructors", style='Header.TLabel').pack(fill='x', pady=(0,10))
     labels = ["Name","Father Name","Mother Name","Blood Group","Mobile No","Expertise"]
@@ -257,51 +249,53 @@ def open_instructors():
         ttk.Label(form, text=l+':').grid(row=i,column=0, sticky='w', padx=6, pady=4)
         e = ttk.Entry(form, width=48); e.grid(row=i,column=1, padx=6, pady=4); entries[l]=e
     cols = ("ID","Name","Father","Mother","Blood","Mobile","Expertise")
-    tree = ttk.Treeview(frm, columns=cols, show='headings', height=10)
-    for c in cols: tree.heading(c, text=c); tree.column(c, anchor='center')
+    tree = VirtualTree(frm, cols, LISTS["instructors"].view(), dispatcher, height=10)
     tree.pack(fill='both', padx=6, pady=8)
     def load():
-        tree.delete(*tree.get_children())
-        for r in fetch_all("SELECT instructor_id, name, father_name, mother_name, blood_group, mobile_no, expertise FROM Instructors ORDER BY instructor_id"):
-            tree.insert("", "end", values=r)
+        tree.refresh()
     def clear_form():
         for e in entries.values(): e.delete(0,tk.END)
+    def saved(patch, key=None):
+        def done(new_key):
+            patch(new_key if key is None else key); clear_form()
+        return done
     def add():
         vals = [entries[l].get().strip() for l in labels]
         if not vals[0]: messagebox.showwarning("Validation", "Name required"); return
-        run_query("INSERT INTO Instructors (name,father_name,mother_name,blood_group,mobile_no,expertise) VALUES (?,?,?,?,?,?)", tuple(vals))
-        load(); clear_form()
+        dispatcher.submit(run_query, Q("instructors.insert"), tuple(vals),
+                          on_done=saved(tree.added), owner=win)
     def on_select(e=None):
-        sel = tree.focus();
-        if not sel: return
-        vals = tree.item(sel,'values')
+        vals = tree.selected()
+        if not vals: return
         for i,l in enumerate(labels):
             entries[l].delete(0,tk.END); entries[l].insert(0, vals[i+1] if vals[i+1] is not None else '')
     def update_rec():
-        sel = tree.focus()
+        sel = tree.selected_key()
         if not sel: messagebox.showwarning("Select","Select instructor to update"); return
-        iid = tree.item(sel,'values')[0]; vals = [entries[l].get().strip() for l in labels]
-        run_query("UPDATE Instructors SET name=?,father_name=?,mother_name=?,blood_group=?,mobile_no=?,expertise=? WHERE instructor_id=?", (*vals, iid))
-        load(); clear_form()
+        iid = sel; vals = [entries[l].get().strip() for l in labels]
+        dispatcher.submit(run_query, Q("instructors.update"), (*vals, iid),
+                          on_done=saved(tree.changed, iid), owner=win)
     def delete_rec():
-        sel = tree.focus()
+        sel = tree.selected_key()
         if not sel: messagebox.showwarning("Select","Select instructor to delete"); return
-        iid = tree.item(sel,'values')[0]
+        iid = sel
         if messagebox.askyesno("Confirm", "Delete this instructor? Related students will set instructor to NULL."):
-            run_query("DELETE FROM Instructors WHERE instructor_id=?", (iid,)); load(); clear_form()
+            dispatcher.submit(run_query, Q("instructors.delete"), (iid,), on_done=saved(tree.removed, iid), owner=win)
     btnf = ttk.Frame(frm); btnf.pack(fill='x', pady=6)
     ttk.Button(btnf, text="Add", style='Primary.TButton', command=add).pack(side='left', padx=6)
     ttk.Button(btnf, text="Update", style='Success.TButton', command=update_rec).pack(side='left', padx=6)
     ttk.Button(btnf, text="Delete", style='Danger.TButton', command=delete_rec).pack(side='left', padx=6)
     ttk.Button(btnf, text="Clear", command=clear_form).pack(side='left', padx=6)
     ttk.Button(btnf, text="Refresh", command=load).pack(side='right', padx=6)
-    tree.bind("<<TreeviewSelect>>", on_select); load()
+    ttk.Button(btnf, text="Export CSV", command=lambda: export_list(win, Q("instructors.list"), cols, "instructors")).pack(side='right', padx=6)
+    tree.bind("<<ListSelect>>", on_select); load()
+    jump_to["instructors"] = lambda key: (tree.clear_filters(), tree.reveal(key))
+    return win
 
 # ------------------------- Students  -----------------------
 
-def open_students():
-    win = tk.Toplevel(root); win.title("Manage Students")
-    center(win, 980, 620); win.configure(bg='#E3F2FD')
+def open_students(win=None):
+    if win is None: win = toplevel("students")
     frm = ttk.Frame(win, padding=12); frm.pack(expand=True, fill='both')
     ttk.Label(frm, text="Students", style='Header.TLabel').pack(fill='x', pady=(0,10))
     labels = ["Name","Father Name","Mother Name","Address","Blood Group","Mobile No","Course","Instructor","Batch No"]
@@ -309,193 +303,155 @@ def open_students():
     for i,l in enumerate(labels):
         ttk.Label(form, text=l+':').grid(row=i,column=0, sticky='w', padx=6, pady=4)
         if l in ("Course","Instructor"):
-            cb = ttk.Combobox(form, width=46); cb.grid(row=i,column=1, padx=6, pady=4); widgets[l]=cb
+            cb = Picker(form, LOOKUPS["courses" if l == "Course" else "instructors"], dispatcher, width=46)
+            cb.grid(row=i,column=1, padx=6, pady=4); widgets[l]=cb
         else:
             e = ttk.Entry(form, width=48); e.grid(row=i,column=1, padx=6, pady=4); widgets[l]=e
     cols = ("ID","Name","Father","Mother","Address","Blood","Mobile","Course","Instructor","Batch")
-    tree = ttk.Treeview(frm, columns=cols, show='headings', height=12)
-    for c in cols: tree.heading(c, text=c); tree.column(c, anchor='center', width=100)
+    sbar = ttk.Frame(frm); sbar.pack(fill='x', padx=6, pady=(6,0))
+    tree = VirtualTree(frm, cols, LISTS["students"].view(), dispatcher, height=12, width=100)
     tree.pack(fill='both', padx=6, pady=8)
-    def load_combos():
-        courses = fetch_all("SELECT course_id, course_name FROM Course ORDER BY course_name")
-        course_map = {f"{c[0]} - {c[1]}": c[0] for c in courses}
-        widgets["Course"]['values'] = list(course_map.keys())
-        instrs = fetch_all("SELECT instructor_id, name FROM Instructors ORDER BY name")
-        instr_map = {f"{i[0]} - {i[1]}": i[0] for i in instrs}
-        widgets["Instructor"]['values'] = list(instr_map.keys())
-        return course_map, instr_map
-    course_map, instr_map = load_combos()
+    ttk.Label(sbar, text="Search:").pack(side='left')
+    search = SearchBox(sbar, tree.search, width=40); search.pack(side='left', padx=6)
+    ttk.Label(sbar, text="name, parents, address, mobile or batch", style='Sub.TLabel').pack(side='left')
     def load():
-        tree.delete(*tree.get_children())
-        data = fetch_all("""
-            SELECT s.student_id, s.name, s.father_name, s.mother_name, s.address, s.blood_group, s.mobile_no,
-                   c.course_name, i.name, s.batch_no
-            FROM Student s
-            LEFT JOIN Course c ON s.course_id=c.course_id
-            LEFT JOIN Instructors i ON s.instructor_id=i.instructor_id
-            ORDER BY s.student_id
-        """)
-        for r in data: tree.insert("", "end", values=r)
+        tree.refresh()
     def clear_form():
         for k,w in widgets.items():
-            if isinstance(w, ttk.Combobox): w.set('')
+            if isinstance(w, Picker): w.clear()
             else: w.delete(0, tk.END)
+    def saved(patch, key=None):
+        def done(new_key):
+            patch(new_key if key is None else key); clear_form()
+        return done
     def add():
-        vals = [widgets[l].get().strip() if isinstance(widgets[l], ttk.Combobox) else widgets[l].get().strip() for l in labels]
+        vals = [widgets[l].get().strip() for l in labels]
         if not vals[0]: messagebox.showwarning("Validation", "Student name required"); return
-        cid = course_map.get(vals[6]); iid = instr_map.get(vals[7])
-        run_query("""INSERT INTO Student (name,father_name,mother_name,address,blood_group,mobile_no,course_id,instructor_id,batch_no)
-                     VALUES (?,?,?,?,?,?,?,?,?)""", (vals[0],vals[1],vals[2],vals[3],vals[4],vals[5],cid,iid,vals[8]))
-        load(); clear_form()
+        cid = widgets["Course"].get_id(); iid = widgets["Instructor"].get_id()
+        dispatcher.submit(run_query, Q("students.insert"), (vals[0],vals[1],vals[2],vals[3],vals[4],vals[5],cid,iid,vals[8]),
+                          on_done=saved(tree.added), owner=win)
     def on_select(e=None):
-        sel = tree.focus();
-        if not sel: return
-        vals = tree.item(sel,'values')
+        vals = tree.selected()
+        if not vals: return
+        cid, iid = vals[10], vals[11]  # hidden key columns
         for i,l in enumerate(labels):
             w = widgets[l]
-            if isinstance(w, ttk.Combobox):
-                if l == "Course":
-                    if vals[7]:
-                        cid = fetch_all("SELECT course_id FROM Course WHERE course_name=?", (vals[7],))
-                        widgets["Course"].set(f"{cid[0][0]} - {vals[7]}" if cid else '')
-                    else: widgets["Course"].set('')
-                else:
-                    if vals[8]:
-                        iid = fetch_all("SELECT instructor_id FROM Instructors WHERE name=?", (vals[8],))
-                        widgets["Instructor"].set(f"{iid[0][0]} - {vals[8]}" if iid else '')
-                    else: widgets["Instructor"].set('')
+            if isinstance(w, Picker):
+                if l == "Course": w.set_id(cid, vals[7])
+                else: w.set_id(iid, vals[8])
             else:
                 w.delete(0, tk.END); w.insert(0, vals[i+1] if vals[i+1] is not None else '')
     def update_rec():
-        sel = tree.focus()
+        sel = tree.selected_key()
         if not sel: messagebox.showwarning("Select","Select a student to update"); return
-        sid = tree.item(sel,'values')[0]
-        vals = [widgets[l].get().strip() if isinstance(widgets[l], ttk.Combobox) else widgets[l].get().strip() for l in labels]
-        cid = course_map.get(vals[6]); iid = instr_map.get(vals[7])
-        run_query("""UPDATE Student SET name=?,father_name=?,mother_name=?,address=?,blood_group=?,mobile_no=?,course_id=?,instructor_id=?,batch_no=? WHERE student_id=?""",
-                  (vals[0],vals[1],vals[2],vals[3],vals[4],vals[5],cid,iid,vals[8],sid))
-        load(); clear_form()
+        sid = sel
+        vals = [widgets[l].get().strip() for l in labels]
+        cid = widgets["Course"].get_id(); iid = widgets["Instructor"].get_id()
+        dispatcher.submit(run_query, Q("students.update"), (vals[0],vals[1],vals[2],vals[3],vals[4],vals[5],cid,iid,vals[8],sid),
+                          on_done=saved(tree.changed, sid), owner=win)
     def delete_rec():
-        sel = tree.focus()
+        sel = tree.selected_key()
         if not sel: messagebox.showwarning("Select","Select a student to delete"); return
-        sid = tree.item(sel,'values')[0]
+        sid = sel
         if messagebox.askyesno("Confirm", "Delete this student? Related results will be deleted."):
-            run_query("DELETE FROM Student WHERE student_id=?", (sid,)); load(); clear_form()
+            dispatcher.submit(run_query, Q("students.delete"), (sid,), on_done=saved(tree.removed, sid), owner=win)
     btnf = ttk.Frame(frm); btnf.pack(fill='x', pady=6)
     ttk.Button(btnf, text="Add", style='Primary.TButton', command=add).pack(side='left', padx=6)
     ttk.Button(btnf, text="Update", style='Success.TButton', command=update_rec).pack(side='left', padx=6)
     ttk.Button(btnf, text="Delete", style='Danger.TButton', command=delete_rec).pack(side='left', padx=6)
     ttk.Button(btnf, text="Clear", command=clear_form).pack(side='left', padx=6)
-    ttk.Button(btnf, text="Refresh Combos", command=lambda: refresh_combos()).pack(side='right', padx=6)
     ttk.Button(btnf, text="Refresh List", command=load).pack(side='right', padx=6)
-    def refresh_combos():
-        nonlocal course_map, instr_map
-        course_map, instr_map = load_combos()
-    tree.bind("<<TreeviewSelect>>", on_select); load()
+    ttk.Button(btnf, text="Export CSV", command=lambda: export_list(win, Q("students.list_joined"), cols, "students")).pack(side='right', padx=6)
+    tree.bind("<<ListSelect>>", on_select); load()
+    jump_to["students"] = lambda key: (search.delete(0, tk.END), tree.search(""), tree.clear_filters(), tree.reveal(key))
+    return win
 
 # ------------------------- Results  -----------------------
 
-def open_results():
-    win = tk.Toplevel(root); win.title("Manage Results")
-    center(win, 900, 520); win.configure(bg='#E3F2FD')
+def open_results(win=None):
+    if win is None: win = toplevel("results")
     frm = ttk.Frame(win, padding=12); frm.pack(expand=True, fill='both')
     ttk.Label(frm, text="Results", style='Header.TLabel').pack(fill='x', pady=(0,10))
     form = ttk.Frame(frm); form.pack(fill='x', pady=6)
     ttk.Label(form, text="Student:").grid(row=0,column=0, sticky='w', padx=6, pady=6)
-    student_cb = ttk.Combobox(form, width=48); student_cb.grid(row=0,column=1, padx=6, pady=6)
+    student_cb = Picker(form, LOOKUPS["students"], dispatcher, width=48); student_cb.grid(row=0,column=1, padx=6, pady=6)
     ttk.Label(form, text="Course:").grid(row=1,column=0, sticky='w', padx=6, pady=6)
-    course_cb = ttk.Combobox(form, width=48); course_cb.grid(row=1,column=1, padx=6, pady=6)
+    course_cb = Picker(form, LOOKUPS["courses"], dispatcher, width=48); course_cb.grid(row=1,column=1, padx=6, pady=6)
     ttk.Label(form, text="Instructor:").grid(row=2,column=0, sticky='w', padx=6, pady=6)
-    instr_cb = ttk.Combobox(form, width=48); instr_cb.grid(row=2,column=1, padx=6, pady=6)
+    instr_cb = Picker(form, LOOKUPS["instructors"], dispatcher, width=48); instr_cb.grid(row=2,column=1, padx=6, pady=6)
     ttk.Label(form, text="Grade:").grid(row=3,column=0, sticky='w', padx=6, pady=6)
     grade_e = ttk.Entry(form, width=20); grade_e.grid(row=3,column=1, padx=6, pady=6, sticky='w')
     cols = ("ID","Student","Course","Instructor","Grade")
-    tree = ttk.Treeview(frm, columns=cols, show='headings', height=10)
-    for c in cols: tree.heading(c, text=c); tree.column(c, anchor='center')
+    tree = VirtualTree(frm, cols, LISTS["results"].view(), dispatcher, height=10)
     tree.pack(fill='both', padx=6, pady=8)
-    def load_combos():
-        students = fetch_all("SELECT student_id, name FROM Student ORDER BY name")
-        student_map = {f"{s[0]} - {s[1]}": s[0] for s in students}
-        student_cb['values'] = list(student_map.keys())
-        courses = fetch_all("SELECT course_id, course_name FROM Course ORDER BY course_name")
-        course_map = {f"{c[0]} - {c[1]}": c[0] for c in courses}
-        course_cb['values'] = list(course_map.keys())
-        instrs = fetch_all("SELECT instructor_id, name FROM Instructors ORDER BY name")
-        instr_map = {f"{i[0]} - {i[1]}": i[0] for i in instrs}
-        instr_cb['values'] = list(instr_map.keys())
-        return student_map, course_map, instr_map
-    student_map, course_map, instr_map = load_combos()
     def load():
-        tree.delete(*tree.get_children())
-        data = fetch_all("""
-            SELECT r.result_id, s.name, c.course_name, i.name, r.grade
-            FROM Result r
-            LEFT JOIN Student s ON r.student_id=s.student_id
-            LEFT JOIN Course c ON r.course_id=c.course_id
-            LEFT JOIN Instructors i ON r.instructor_id=i.instructor_id
-            ORDER BY r.result_id
-        """)
-        for r in data: tree.insert("", "end", values=r)
+        tree.refresh()
     def clear_form():
-        student_cb.set(''); course_cb.set(''); instr_cb.set(''); grade_e.delete(0,tk.END)
+        student_cb.clear(); course_cb.clear(); instr_cb.clear(); grade_e.delete(0,tk.END)
+    def saved(patch, key=None):
+        def done(new_key):
+            patch(new_key if key is None else key); clear_form()
+        return done
     def add():
-        s = student_cb.get(); c = course_cb.get(); i = instr_cb.get(); g = grade_e.get().strip()
-        if not (s and c and i and g): messagebox.showwarning("Validation", "All fields required"); return
-        sid = student_map.get(s); cid = course_map.get(c); iid = instr_map.get(i)
-        run_query("INSERT INTO Result (student_id,course_id,grade,instructor_id) VALUES (?,?,?,?)", (sid,cid,g,iid))
-        load(); clear_form()
+        sid = student_cb.get_id(); cid = course_cb.get_id(); iid = instr_cb.get_id(); g = grade_e.get().strip()
+        if None in (sid, cid, iid) or not g: messagebox.showwarning("Validation", "All fields required"); return
+        dispatcher.submit(run_query, Q("results.insert"), (sid,cid,g,iid),
+                          on_done=saved(tree.added), owner=win)
     def on_select(e=None):
-        sel = tree.focus();
-        if not sel: return
-        vals = tree.item(sel,'values')
-        student_key = next((k for k,v in student_map.items() if v == fetch_student_id_by_name(vals[1])), '')
-        course_key = next((k for k,v in course_map.items() if v == fetch_course_id_by_name(vals[2])), '')
-        instr_key = next((k for k,v in instr_map.items() if v == fetch_instructor_id_by_name(vals[3])), '')
-        if student_key: student_cb.set(student_key)
-        if course_key: course_cb.set(course_key)
-        if instr_key: instr_cb.set(instr_key)
+        vals = tree.selected()
+        if not vals: return
+        sid, cid, iid = vals[5], vals[6], vals[7]  # hidden key columns
+        student_cb.set_id(sid, vals[1]); course_cb.set_id(cid, vals[2]); instr_cb.set_id(iid, vals[3])
         grade_e.delete(0,tk.END); grade_e.insert(0, vals[4] if vals[4] is not None else '')
-    def fetch_student_id_by_name(name):
-        if not name: return None
-        r = fetch_all("SELECT student_id FROM Student WHERE name=?", (name,))
-        return r[0][0] if r else None
-    def fetch_course_id_by_name(name):
-        if not name: return None
-        r = fetch_all("SELECT course_id FROM Course WHERE course_name=?", (name,))
-        return r[0][0] if r else None
-    def fetch_instructor_id_by_name(name):
-        if not name: return None
-        r = fetch_all("SELECT instructor_id FROM Instructors WHERE name=?", (name,))
-        return r[0][0] if r else None
     def update_rec():
-        sel = tree.focus()
+        sel = tree.selected_key()
         if not sel: messagebox.showwarning("Select","Select a result to update"); return
-        rid = tree.item(sel,'values')[0]
-        s = student_cb.get(); c = course_cb.get(); i = instr_cb.get(); g = grade_e.get().strip()
-        if not (s and c and i and g): messagebox.showwarning("Validation", "All fields required"); return
-        sid = student_map.get(s); cid = course_map.get(c); iid = instr_map.get(i)
-        run_query("UPDATE Result SET student_id=?,course_id=?,grade=?,instructor_id=? WHERE result_id=?", (sid,cid,g,iid,rid))
-        load(); clear_form()
+        rid = sel
+        sid = student_cb.get_id(); cid = course_cb.get_id(); iid = instr_cb.get_id(); g = grade_e.get().strip()
+        if None in (sid, cid, iid) or not g: messagebox.showwarning("Validation", "All fields required"); return
+        dispatcher.submit(run_query, Q("results.update"), (sid,cid,g,iid,rid),
+                          on_done=saved(tree.changed, rid), owner=win)
     def delete_rec():
-        sel = tree.focus()
+        sel = tree.selected_key()
         if not sel: messagebox.showwarning("Select","Select a result to delete"); return
-        rid = tree.item(sel,'values')[0]
-        if messagebox.askyesno("Confirm","Delete this result?"): run_query("DELETE FROM Result WHERE result_id=?", (rid,)); load(); clear_form()
+        rid = sel
+        if messagebox.askyesno("Confirm","Delete this result?"):
+            dispatcher.submit(run_query, Q("results.delete"), (rid,), on_done=saved(tree.removed, rid), owner=win)
     btnf = ttk.Frame(frm); btnf.pack(fill='x', pady=6)
     ttk.Button(btnf, text="Add", style='Primary.TButton', command=add).pack(side='left', padx=6)
     ttk.Button(btnf, text="Update", style='Success.TButton', command=update_rec).pack(side='left', padx=6)
     ttk.Button(btnf, text="Delete", style='Danger.TButton', command=delete_rec).pack(side='left', padx=6)
     ttk.Button(btnf, text="Clear", command=clear_form).pack(side='left', padx=6)
-    ttk.Button(btnf, text="Refresh Combos", command=lambda: refresh_maps()).pack(side='right', padx=6)
     ttk.Button(btnf, text="Refresh List", command=load).pack(side='right', padx=6)
-    def refresh_maps():
-        nonlocal student_map, course_map, instr_map
-        student_map, course_map, instr_map = load_combos()
-    tree.bind("<<TreeviewSelect>>", on_select); load()
+    ttk.Button(btnf, text="Export CSV", command=lambda: export_list(win, Q("results.list_joined"), cols, "results")).pack(side='right', padx=6)
+    tree.bind("<<ListSelect>>", on_select); load()
+    jump_to["results"] = lambda key: (tree.clear_filters(), tree.reveal(key))
+    return win
+
+# ------------------------- Screens  -----------------------
+jump_to = {}  # kind -> select(key) in that screen's list, registered when the screen is built
+# kind: (button text, window title, window size, open/build function, prefetch for the first load)
+def prefetch(*lists, lookups=()):
+    def run():
+        for name in lookups: LOOKUPS[name].prefetch()
+        for name in lists: LISTS[name].prefetch()
+    return run
+
+SCREENS = {
+    "students": (" Students", "Manage Students", (980, 620), open_students,
+                 prefetch("students", lookups=("courses", "instructors"))),
+    "courses": (" Courses", "Manage Courses", (660, 480), open_courses, prefetch("courses")),
+    "instructors": (" Instructors", "Manage Instructors", (820, 520), open_instructors, prefetch("instructors")),
+    "results": (" Results", "Manage Results", (900, 520), open_results,
+                prefetch("results", lookups=("courses", "instructors"))),
+}
 
 # ------------------------- Main Login UI (match provided design)  -----------------------
 
 root = tk.Tk(); root.title("NVIT - Management System")
+root.report_callback_exception = report_error
+executor = DBExecutor(); dispatcher = TkDispatcher(root, executor)
+windows = WindowPool()
 center(root, 480, 460); root.configure(bg='#E3F2FD')
 main = ttk.Frame(root, padding=16); main.pack(expand=True, fill='both')
 ttk.Label(main, text="NVIT", style='Title.TLabel',font=("Helvetica", 20, "bold")).pack(pady=(10,2))
@@ -512,3 +468,6 @@ login_btn = ttk.Button(btn_frame, text="Login", style='Primary.TButton', command
 ttk.Button(main, text="Create Account", style='Secondary.TButton', command=open_register).pack(pady=(10,4))
 ttk.Label(main, text="(Use Create Account to register first)", style='Sub.TLabel').pack(pady=(8,0))
 root.mainloop()
+executor.shutdown(); logging.info("query timings\n%s", db.tracer.format_summary())
+logging.info("connections: %s", db.stats()); logging.info("query cache: %s", db.cache.stats())
+logging.info("lock contention: %s", db.contention_stats() or "none"); db.close()
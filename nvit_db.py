@@ -0,0 +1,1930 @@
+# nvit_db.py
+# Data layer for the NVIT management system.
+import sqlite3, threading, queue, time, sys, logging, logging.handlers, re, csv, itertools, random, bisect, json, math
+from collections import OrderedDict, defaultdict, deque, namedtuple
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, closing
+
+PRAGMAS = ("PRAGMA foreign_keys = ON",)
+# Multi-instance mode: readers no longer block the writer. WAL needs every instance to
+# reach the file through a filesystem with working shared memory (local disk or a
+# share that supports byte-range locks), not a plain network drive.
+CONCURRENT_PRAGMAS = ("PRAGMA journal_mode = WAL", "PRAGMA synchronous = NORMAL")
+
+log = logging.getLogger("nvit.db")
+
+
+# ------------------------- Connection manager -------------------------
+
+class DatabaseBusy(sqlite3.OperationalError):
+    """The database stayed locked by another connection after every retry."""
+
+def _is_busy(exc):
+    msg = str(exc).lower()
+    return "database is locked" in msg or "database is busy" in msg or "database table is locked" in msg
+
+
+class ConnectionManager:
+    """Keeps one writer and a small pool of reader connections open for the process.
+
+    Pragmas are applied once when a connection is opened instead of on every call.
+    With ``concurrent=True`` (several app instances on one database file) the file is
+    switched to WAL and transient SQLITE_BUSY errors are retried with jittered backoff,
+    and changed_elsewhere() tells when another instance has committed.
+    """
+    def __init__(self, path, readers=2, timeout=5.0, cache_bytes=16 << 20,
+                 concurrent=False, retries=6, backoff=0.05, tracer=None):
+        self.path = path; self.max_readers = readers; self.timeout = timeout
+        self._writer = None; self._write_lock = threading.RLock()
+        self._idle = queue.LifoQueue(); self._readers = []
+        self._lock = threading.Lock(); self._closed = False
+        self._uses = {}; self._names = {}
+        self.cache = QueryCache(cache_bytes); self._effects = (None, {}, {}); self._tx = None
+        self.concurrent = concurrent; self.retries = retries if concurrent else 0; self.backoff = backoff
+        self._contention = defaultdict(lambda: {"calls": 0, "busy": 0, "retries": 0, "wait": 0.0, "failures": 0})
+        self.tracer = tracer or Tracer(); self._data_version = None
+
+    def _connect(self, name):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                               check_same_thread=False, cached_statements=max(128, 2 * len(Q)))
+        conn.execute(f"PRAGMA busy_timeout = {int(self.timeout * 1000)}")
+        for p in PRAGMAS + (CONCURRENT_PRAGMAS if self.concurrent else ()): conn.execute(p)
+        if self.tracer.echo: conn.set_trace_callback(lambda sql, name=name: sql_log.info("[%s] %s", name, sql))
+        self._uses[name] = {"name": name, "opened": time.time(), "uses": 0}
+        self._names[id(conn)] = name
+        return conn
+
+    @contextmanager
+    def writer(self):
+        with self._write_lock:
+            if self._closed: raise sqlite3.ProgrammingError("connection manager is closed")
+            if self._writer is None: self._writer = self._connect("writer")
+            self._uses["writer"]["uses"] += 1
+            yield self._writer
+
+    @contextmanager
+    def reader(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if self._closed: conn.close()
+            else: self._idle.put(conn)
+
+    def _acquire(self):
+        if self._closed: raise sqlite3.ProgrammingError("connection manager is closed")
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if len(self._readers) < self.max_readers:
+                    conn = self._connect(f"reader-{len(self._readers) + 1}")
+                    self._readers.append(conn)
+                else:
+                    conn = None
+            if conn is None: conn = self._idle.get()
+        with self._lock: self._uses[self._names[id(conn)]]["uses"] += 1
+        return conn
+
+    def write_effects(self, conn, writes):
+        """Tables whose contents may change through ``writes`` ((table, op) pairs, see
+        writes_of), following foreign-key actions and triggers of that operation only: an
+        INSERT fires no ON DELETE/UPDATE action. Rebuilt when the schema changes."""
+        self._schema(conn)
+        direct = self._effects[1]; seen = set(); todo = list(writes)
+        while todo:
+            w = todo.pop()
+            if w in seen: continue
+            seen.add(w); todo.extend(direct.get(w, ()))
+            if w[1] == "update.*": todo.extend(k for k in direct if k[0] == w[0] and k[1].startswith("update."))
+        return {t for t, _ in seen}
+
+    def _schema(self, conn):
+        cookie = conn.execute("PRAGMA schema_version").fetchone()[0]
+        if self._effects[0] != cookie:
+            direct = defaultdict(set); keys = {}; fks = []
+            for name, kind, sql in conn.execute("SELECT name, type, sql FROM sqlite_master WHERE type IN ('table','trigger')"):
+                if kind == "table":
+                    pk = [c[1] for c in conn.execute(f'PRAGMA table_info("{name}")') if c[5]]
+                    if len(pk) == 1: keys[name.lower()] = pk[0].lower()
+                    fks.append((name.lower(), list(conn.execute(f'PRAGMA foreign_key_list("{name}")'))))
+                else:
+                    head, _, body = re.split(r"\b(BEGIN)\b", sql, 1, flags=re.I)
+                    on = re.search(r"\b(INSERT|UPDATE|DELETE)\b(?:\s+OF\s+([^;]*?))?\s+ON\s+\"?(\w+)", head, re.I)
+                    if not on: continue
+                    op, cols, table = on.group(1).lower(), on.group(2), on.group(3).lower()
+                    for k in ([(table, f"update.{c.strip().lower()}") for c in cols.split(",")] if cols else [(table, op)]):
+                        direct[k].update(writes_of(body))
+            # a foreign-key action fires on a delete, or an update of the referenced column
+            for child, fk_list in fks:
+                for fk in fk_list:
+                    parent = fk[2].lower(); to = (fk[4] or keys.get(parent, "rowid")).lower()
+                    for op, action in ((f"update.{to}", fk[5]), ("delete", fk[6])):
+                        if action in ("NO ACTION", "RESTRICT"): continue
+                        direct[(parent, op)] |= {(child, "delete")} if action == "CASCADE" and op == "delete" else \
+                            {(child, "update"), (child, f"update.{fk[3].lower()}")}
+            self._effects = (cookie, direct, keys)
+        return self._effects
+
+    def changed_key(self, conn, sql, params, rowid):
+        """Primary key of the one row a statement wrote, when the SQL tells: an INSERT's
+        rowid, or the last parameter of an UPDATE/DELETE ending in WHERE <pk> = ?."""
+        written = tables_written(sql)
+        if len(written) != 1: return None
+        if re.match(r"\s*(INSERT|REPLACE)\b", sql, re.I): return rowid
+        m = _KEY_WHERE.search(sql); pk = self._schema(conn)[2].get(next(iter(written)))
+        if m and m.group(1).lower() == pk and isinstance(params, (tuple, list)) and params: return params[-1]
+        return None
+
+    def call(self, sql, fn, trace=True):
+        """Run one statement via fn(): time it for the tracer and retry SQLITE_BUSY.
+
+        Retries (jittered exponential backoff) only happen in concurrent mode; a lock
+        that outlasts them raises DatabaseBusy. Every call is recorded in
+        contention_stats() under the statement's registry name.
+        """
+        attempt = 0; start = time.perf_counter(); waited = 0.0; failed = False
+        try:
+            while True:
+                try:
+                    t = time.perf_counter(); result = fn()
+                    if trace: self.tracer.record(sql, time.perf_counter() - t, _rowcount(result))
+                    return result
+                except sqlite3.OperationalError as e:
+                    if not _is_busy(e): raise
+                    waited = time.perf_counter() - start
+                    if attempt >= self.retries:
+                        failed = True
+                        raise DatabaseBusy(f"{e} (gave up after {attempt} retries)") from e
+                    attempt += 1
+                    time.sleep(min(1.0, self.backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+        finally:
+            with self._lock:
+                c = self._contention[Q.name_of(sql)]; c["calls"] += 1
+                if waited:
+                    c["busy"] += 1; c["retries"] += attempt; c["wait"] += waited; c["failures"] += failed
+
+    def changed_elsewhere(self):
+        """Whether another connection (another app instance, a sqlite3 shell) has committed
+        since the last call; the cache is cleared before anyone can read it again.
+
+        Read from the writer's PRAGMA data_version, which moves only for commits made
+        through other connections. None while this process holds the writer, when it
+        cannot be asked.
+        """
+        if not self._write_lock.acquire(blocking=False): return None
+        try:
+            if self._closed: return None
+            if self._writer is None: self._writer = self._connect("writer")
+            version = self._writer.execute("PRAGMA data_version").fetchone()[0]
+            changed = self._data_version is not None and version != self._data_version
+            self._data_version = version
+            if changed: self.cache.clear()
+            return changed
+        finally:
+            self._write_lock.release()
+
+    def contention_stats(self):
+        """{statement: {calls, busy, retries, wait, failures}} for statements that hit a lock."""
+        with self._lock:
+            return {k: dict(v, wait=round(v["wait"], 3)) for k, v in self._contention.items() if v["busy"]}
+
+    def stats(self):
+        """Per-connection reuse counts, e.g. [{'name': 'writer', 'uses': 42, ...}]."""
+        return [dict(v, age=round(time.time() - v["opened"], 1)) for v in self._uses.values()]
+
+    def close(self):
+        """Close every connection, each after PRAGMA optimize: SQLite re-analyzes the tables
+        whose statistics the statements run on that connection would now plan differently by."""
+        with self._write_lock, self._lock:
+            if self._closed: return
+            self._closed = True
+            conns = [self._writer] if self._writer is not None else []; self._writer = None
+            while True:
+                try: conns.append(self._idle.get_nowait())
+                except queue.Empty: break
+            for conn in conns:
+                try: conn.execute("PRAGMA analysis_limit = 1000"); conn.execute("PRAGMA optimize")
+                except sqlite3.Error as e: log.warning("PRAGMA optimize failed: %s", e)  # e.g. another instance is writing
+                conn.close()
+
+
+def _rowcount(result):
+    if isinstance(result, list): return len(result)
+    return getattr(result, "rowcount", -1)
+
+
+# ------------------------- Tracing -------------------------
+
+sql_log = logging.getLogger("nvit.db.sql")
+# slow statements only go to a Tracer's slow_log file, never to stderr or the app's log
+slow_sql_log = logging.getLogger("nvit.db.slow")
+slow_sql_log.addHandler(logging.NullHandler()); slow_sql_log.propagate = False
+_trace_ctx = threading.local()
+
+def caller_label():
+    """Window-level name of the code issuing a query, e.g. 'open_results.load'.
+
+    Worker threads inherit the label captured when the work was submitted.
+    """
+    label = getattr(_trace_ctx, "caller", None)
+    if label: return label
+    f = sys._getframe(1); first = None
+    while f is not None:
+        if f.f_globals.get("__name__") != __name__:
+            qual = getattr(f.f_code, "co_qualname", f.f_code.co_name)
+            if "<locals>" in qual: return qual.replace(".<locals>", "")
+            first = first or qual
+        f = f.f_back
+    return first or "?"
+
+def with_caller(label, fn, *args):
+    _trace_ctx.caller = label
+    try:
+        return fn(*args)
+    finally:
+        _trace_ctx.caller = None
+
+
+class Tracer:
+    """Per-statement timings plus a rotating log of statements slower than ``slow_ms``.
+
+    Samples are kept per registry name (last ``keep`` of each) for summary().
+    ``echo=True`` also logs every statement SQLite runs, including trigger bodies,
+    through sqlite3's set_trace_callback.
+    """
+    def __init__(self, slow_ms=200, slow_log=None, keep=1000, echo=False):
+        self.slow_ms = slow_ms; self.echo = echo; self.keep = keep
+        self._samples = defaultdict(lambda: deque(maxlen=keep)); self._lock = threading.Lock()
+        self.slow = slow_sql_log
+        if slow_log and not any(isinstance(h, logging.handlers.RotatingFileHandler) for h in self.slow.handlers):
+            h = logging.handlers.RotatingFileHandler(slow_log, maxBytes=1 << 20, backupCount=3, encoding="utf-8")
+            h.setFormatter(logging.Formatter("%(asctime)s\t%(message)s"))
+            self.slow.addHandler(h); self.slow.setLevel(logging.INFO)
+
+    def record(self, sql, seconds, rows=-1):
+        name = Q.name_of(sql)
+        with self._lock: self._samples[name].append(seconds)
+        if seconds * 1000 >= self.slow_ms:
+            self.slow.warning("%.1f\t%d\t%s\t%s", seconds * 1000, rows, caller_label(), name)
+
+    def summary(self):
+        """[(statement, calls, p50_ms, p95_ms, p99_ms, max_ms)], slowest p95 first."""
+        with self._lock: samples = {k: sorted(v) for k, v in self._samples.items() if v}
+        return sorted(((k,) + _percentiles(v) for k, v in samples.items()), key=lambda r: -r[3])
+
+    def format_summary(self):
+        return format_summary(self.summary())
+
+def _percentiles(values):
+    """(count, p50, p95, p99, max) in ms by nearest rank over sorted seconds."""
+    pick = lambda pct: values[min(len(values) - 1, max(0, -(-len(values) * pct // 100) - 1))] * 1000
+    return (len(values), pick(50), pick(95), pick(99), values[-1] * 1000)
+
+def format_summary(rows):
+    out = [f"{'statement':<40} {'calls':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+    for name, n, p50, p95, p99, mx in rows:
+        out.append(f"{name[:40]:<40} {n:>7} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f} {mx:>9.2f}")
+    return "\n".join(out)
+
+def slow_log_summary(path):
+    """Summarize a slow-query log (and its rotated backups) by statement.
+
+    Only statements at or over slow_ms are logged, so the percentiles are of the slow
+    tail, not of every call; Tracer.summary() has those.
+    """
+    import glob
+    samples = defaultdict(list)
+    for fname in sorted(glob.glob(path + ".*")) + [path]:
+        with open(fname, encoding="utf-8") as fh:
+            for line in fh:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) == 5: samples[parts[4]].append(float(parts[1]) / 1000)
+    return sorted(((k,) + _percentiles(sorted(v)) for k, v in samples.items()), key=lambda r: -r[3])
+
+
+# ------------------------- Change events -------------------------
+
+class EventBus:
+    """In-process publish/subscribe for row changes: handlers get (table, key).
+
+    ``key`` is the primary key of the one row a write touched, or None when any
+    rows of the table may have changed. Handlers run in the writing thread (often a
+    DBExecutor worker); UI code subscribes through TkDispatcher.subscribe instead.
+    """
+    def __init__(self):
+        self._subs = defaultdict(list); self._lock = threading.Lock()
+
+    def subscribe(self, table, fn):
+        """Call fn(table, key) for every change to ``table``; returns an unsubscribe function."""
+        table = table.lower()
+        with self._lock: self._subs[table].append(fn)
+        def unsubscribe():
+            with self._lock:
+                if fn in self._subs[table]: self._subs[table].remove(fn)
+        return unsubscribe
+
+    def publish(self, table, key=None):
+        with self._lock: handlers = list(self._subs.get(table.lower(), ()))
+        for fn in handlers:
+            try: fn(table.lower(), key)
+            except Exception: log.exception("change handler for %s failed", table)
+
+events = EventBus()
+
+def _publish(tables, written=(), key=None):
+    for t in sorted(tables): events.publish(t, key if t in written else None)
+
+
+# ------------------------- Query cache -------------------------
+
+_READS = re.compile(r"\b(?:FROM|JOIN)\s+\"?(\w+)", re.I)
+_KEY_WHERE = re.compile(r"\bWHERE\s+\"?(\w+)\"?\s*=\s*\?\s*;?\s*$", re.I)
+_WRITES = re.compile(r"\b(INSERT(?:\s+OR\s+(\w+))?\s+INTO|REPLACE\s+INTO|(?<!DO )UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+\"?(\w+)", re.I)
+_UPSERT = re.compile(r"\bON\s+CONFLICT\b[^;]*\bDO\s+UPDATE\b", re.I)
+
+def tables_read(sql):
+    return {t.lower() for t in _READS.findall(sql)}
+
+_SET = re.compile(r"\s+SET\s+(.*?)(?:\bWHERE\b|\bFROM\b|;|$)", re.I | re.S)
+
+def writes_of(sql):
+    """{(table, op)} of the writes in ``sql``, op being 'insert', 'delete' or 'update'.
+
+    An UPDATE also names each column it sets as 'update.<column>' ('update.*' when the
+    SET clause cannot be read); a REPLACE also deletes and an upsert also updates.
+    """
+    writes = set()
+    for m in _WRITES.finditer(sql):
+        verb, conflict, table = m.groups(); t = table.lower(); verb = verb.split()[0].lower()
+        if verb in ("insert", "replace"):
+            writes.add((t, "insert"))
+            if "replace" in (verb, (conflict or "").lower()): writes.add((t, "delete"))
+            if _UPSERT.search(sql): writes |= {(t, "update"), (t, "update.*")}
+        elif verb == "update":
+            s = _SET.match(sql, m.end()); cols = re.findall(r"(?:^|,)\s*\"?(\w+)\"?\s*=", s.group(1)) if s else []
+            writes |= {(t, "update"), *((t, f"update.{c.lower()}") for c in cols or ["*"])}
+        else: writes.add((t, verb))
+    return writes
+
+def tables_written(sql):
+    return {t for t, _ in writes_of(sql)}
+
+def _sizeof(rows):
+    return sys.getsizeof(rows) + sum(sys.getsizeof(r) + sum(sys.getsizeof(v) for v in r) for r in rows)
+
+_MISS = object()
+
+class QueryCache:
+    """LRU cache of read results keyed by (sql, params) with a byte budget.
+
+    Entries remember the tables they read; a write drops only the entries that
+    depend on the tables it touched. Per-table generations stop a read that
+    raced with a write from caching stale rows.
+    """
+    def __init__(self, max_bytes=16 << 20):
+        self.max_bytes = max_bytes; self.bytes = 0
+        self._entries = OrderedDict(); self._by_table = defaultdict(set); self._gen = defaultdict(int)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1; return _MISS
+            self._entries.move_to_end(key); self.hits += 1
+            return entry[0]
+
+    def generation(self, tables):
+        with self._lock: return tuple(self._gen[t] for t in tables)
+
+    def put(self, key, rows, tables, gen):
+        size = _sizeof(rows)
+        if size > self.max_bytes // 4: return
+        with self._lock:
+            if tuple(self._gen[t] for t in tables) != gen: return
+            if key in self._entries: self._drop(key)
+            self._entries[key] = (rows, size, tables); self.bytes += size
+            for t in tables: self._by_table[t].add(key)
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries))); self.evictions += 1
+
+    def _drop(self, key):
+        rows, size, tables = self._entries.pop(key)
+        self.bytes -= size
+        for t in tables: self._by_table[t].discard(key)
+
+    def invalidate(self, tables):
+        with self._lock:
+            for t in tables:
+                self._gen[t] += 1
+                for key in list(self._by_table.pop(t, ())):
+                    if key in self._entries: self._drop(key); self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for t in list(self._gen): self._gen[t] += 1
+            self._entries.clear(); self._by_table.clear(); self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"entries": len(self._entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                    "evictions": self.evictions, "invalidations": self.invalidations}
+
+
+# ------------------------- Name matching -------------------------
+
+# Spellings of the same name part, mapped to one canonical word before matching.
+NAME_WORDS = {
+    **dict.fromkeys(("md", "mohd", "mohammad", "mohammed", "mohamed", "mohammod", "muhammad", "muhammed",
+                     "mohamad", "muhammod"), "md"),
+    **dict.fromkeys(("mst", "most", "mosammat", "mosammet", "mosamat", "musammat"), "mst"),
+    **dict.fromkeys(("sk", "sheikh", "shaikh", "shekh", "seikh"), "sk"),
+}
+# Letters romanized inconsistently from Bengali ("Zahedul"/"Jahidul", "Hossain"/"Hussain"),
+# folded in order; doubled letters are collapsed last.
+NAME_FOLDS = (("ph", "f"), ("z", "j"), ("y", "i"), ("w", "u"), ("e", "i"), ("o", "u"))
+
+def normalize_name(name):
+    """Matching key of a name: lower case letters only, canonical prefixes, folded spellings."""
+    words = []
+    for w in re.findall(r"[^\W\d_]+", (name or "").casefold()):
+        w = NAME_WORDS.get(w, w)
+        for a, b in NAME_FOLDS: w = w.replace(a, b)
+        words.append(re.sub(r"(.)\1+", r"\1", w))
+    return " ".join(words)
+
+def trigrams(key):
+    """Trigrams of each word of a normalized key, padded with a space on either side."""
+    return {f" {w} "[i:i + 3] for w in key.split() for i in range(len(w))}
+
+@lru_cache(maxsize=65536)
+def name_trigrams(name):
+    return frozenset(trigrams(normalize_name(name)))
+
+def similarity(a, b):
+    """Jaccard similarity of two trigram sets."""
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+# ------------------------- Phone numbers -------------------------
+
+def phone_key(text):
+    """Canonical mobile number: its digits, Bangladeshi numbers as 01XXXXXXXXX
+    ("+8801710000001", "017-1000-0001" and "01710000001" are one number); None under 4 digits."""
+    d = re.sub(r"\D", "", text or "")
+    if d.startswith("00") and len(d) > 11: d = d[2:]
+    if d.startswith("880") and len(d) == 13: d = "0" + d[3:]
+    elif d.startswith("1") and len(d) == 10: d = "0" + d
+    return d if len(d) >= 4 else None
+
+def phone_rev(text):
+    """phone_key() reversed: a suffix of the number becomes an indexable prefix."""
+    key = phone_key(text)
+    return key[::-1] if key else None
+
+
+# ------------------------- Schema migrations -------------------------
+
+MIGRATIONS = []
+
+def migration(version, name):
+    """Register fn(conn) as the step that brings the schema to ``version``."""
+    def deco(fn):
+        MIGRATIONS.append((version, name, fn)); MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return deco
+
+def schema_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+class MigrationError(RuntimeError):
+    """The database cannot be brought to this app's schema as it stands."""
+
+def copy_rows(conn, select_sql, insert_sql, params=(), batch=1000):
+    """Stream rows from select_sql into insert_sql in executemany batches."""
+    cur = conn.execute(select_sql, params); n = 0
+    while True:
+        rows = cur.fetchmany(batch)
+        if not rows: return n
+        conn.executemany(insert_sql, rows); n += len(rows)
+
+def migrate(conn):
+    """Apply pending migrations in one transaction; returns [(version, name, seconds)].
+
+    A database that is already current costs a single PRAGMA read. Foreign keys are off
+    while migrations run, so a rebuilt table does not cascade into its children, and
+    are checked before the commit.
+    """
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    if current > schema_version():
+        raise MigrationError(f"database schema v{current} is newer than this app (v{schema_version()})")
+    if all(v <= current for v, _, _ in MIGRATIONS): return []
+    timings = []; started = time.perf_counter()
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys = OFF")  # a no-op inside a transaction
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # another instance may have migrated while we waited for the write lock
+        current = conn.execute("PRAGMA user_version").fetchone()[0]
+        pending = [m for m in MIGRATIONS if m[0] > current]
+        if not pending:
+            conn.execute("COMMIT"); return []
+        for version, name, fn in pending:
+            t = time.perf_counter(); fn(conn)
+            timings.append((version, name, time.perf_counter() - t))
+        broken = [r for t in BASE_TABLES for r in conn.execute(f"PRAGMA foreign_key_check({t})")]
+        if broken:
+            raise MigrationError(f"{len(broken)} row(s) refer to missing parents, e.g. {broken[0][0]} rowid {broken[0][1]} -> {broken[0][2]}")
+        conn.execute(f"PRAGMA user_version = {pending[-1][0]}")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK"); raise
+    finally:
+        conn.execute(f"PRAGMA foreign_keys = {foreign_keys}")
+    for version, name, secs in timings:
+        log.info("migration %d (%s): %.1f ms", version, name, secs * 1000)
+    log.info("schema v%d -> v%d in %.1f ms", current, pending[-1][0], (time.perf_counter() - started) * 1000)
+    return timings
+
+
+BASE_TABLES = {
+    "users": """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL""",
+    "Course": """
+        course_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        course_name TEXT NOT NULL UNIQUE,
+        duration TEXT NOT NULL,
+        course_price REAL""",
+    "Instructors": """
+        instructor_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        father_name TEXT,
+        mother_name TEXT,
+        blood_group TEXT,
+        mobile_no TEXT,
+        expertise TEXT""",
+    "Student": """
+        student_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        father_name TEXT,
+        mother_name TEXT,
+        address TEXT,
+        blood_group TEXT,
+        mobile_no TEXT,
+        course_id INTEGER,
+        instructor_id INTEGER,
+        batch_no TEXT,
+        FOREIGN KEY(course_id) REFERENCES Course(course_id) ON DELETE SET NULL,
+        FOREIGN KEY(instructor_id) REFERENCES Instructors(instructor_id) ON DELETE SET NULL""",
+    "Result": """
+        result_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER,
+        course_id INTEGER,
+        grade TEXT,
+        instructor_id INTEGER,
+        FOREIGN KEY(student_id) REFERENCES Student(student_id) ON DELETE CASCADE,
+        FOREIGN KEY(course_id) REFERENCES Course(course_id) ON DELETE SET NULL,
+        FOREIGN KEY(instructor_id) REFERENCES Instructors(instructor_id) ON DELETE SET NULL""",
+}
+
+@migration(1, "base schema")
+def _base_schema(conn):
+    # databases made by earlier versions of the app may already have these tables (SQLite
+    # matches names case-insensitively): one that lacks optional columns is rebuilt with
+    # them, one with columns of some other schema is not this app's and stops the migration
+    existing = {n.lower(): n for n, in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    for table, columns in BASE_TABLES.items():
+        old = existing.get(table.lower())
+        if old is None:
+            conn.execute(f"CREATE TABLE {table} ({columns})"); continue
+        new = f"_new_{table}"
+        conn.execute(f"CREATE TABLE {new} ({columns})")
+        want = {r[1].lower(): r for r in conn.execute(f"PRAGMA table_info({new})")}
+        have = [r[1] for r in conn.execute(f'PRAGMA table_info("{old}")')]
+        unknown = [c for c in have if c.lower() not in want]
+        if unknown:
+            raise MigrationError(f'table "{old}" has columns this app does not know ({", ".join(unknown)}); '
+                                 f"it is not an NVIT {table} table: rename or remove it, then start again")
+        missing = [r for c, r in want.items() if c not in {h.lower() for h in have}]
+        if not missing:
+            conn.execute(f"DROP TABLE {new}"); continue
+        required = [r[1] for r in missing if r[3] and r[4] is None and not r[5]]  # NOT NULL, no default, not the key
+        if required:
+            raise MigrationError(f'table "{old}" lacks required columns ({", ".join(required)}) of {table}')
+        cols = ", ".join(have)
+        n = copy_rows(conn, f'SELECT {cols} FROM "{old}"', f"INSERT INTO {new} ({cols}) VALUES ({', '.join('?' * len(have))})")
+        conn.execute(f'DROP TABLE "{old}"')
+        conn.execute(f"ALTER TABLE {new} RENAME TO {table}")
+        log.info("rebuilt %s with %s (%d rows)", table, ", ".join(r[1] for r in missing), n)
+
+
+def _create_indexes(conn, indexes):
+    for name, ddl in indexes.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {ddl}")
+
+@migration(2, "index pack")
+def _index_pack(conn):
+    _create_indexes(conn, BASE_INDEXES)
+
+
+@migration(3, "sort indexes")
+def _sort_indexes(conn):
+    _create_indexes(conn, SORT_INDEXES)
+
+
+@migration(4, "picker indexes")
+def _picker_indexes(conn):
+    _create_indexes(conn, PICKER_INDEXES)
+
+
+STUDENT_FTS_COLUMNS = "name, father_name, mother_name, address, mobile_no, batch_no"
+
+@migration(5, "student full-text search")
+def _student_fts(conn):
+    cols = STUDENT_FTS_COLUMNS; names = [c.strip() for c in cols.split(",")]
+    new = ", ".join(f"new.{c}" for c in names); old = ", ".join(f"old.{c}" for c in names)
+    # external content: the index keeps only tokens, Student stays the one copy of the text;
+    # prefix indexes keep a short prefix ('m*', 'rah*') from merging the doclist of every term it covers
+    conn.execute(f"""CREATE VIRTUAL TABLE student_fts USING fts5({cols},
+        content='Student', content_rowid='student_id', tokenize='unicode61 remove_diacritics 2',
+        prefix='1 2 3')""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS student_fts_insert AFTER INSERT ON Student BEGIN
+        INSERT INTO student_fts(rowid, {cols}) VALUES (new.student_id, {new}); END""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS student_fts_delete AFTER DELETE ON Student BEGIN
+        INSERT INTO student_fts(student_fts, rowid, {cols}) VALUES ('delete', old.student_id, {old}); END""")
+    # students.update sets every column: without WHEN each edit would re-tokenize the whole row
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS student_fts_update AFTER UPDATE OF {cols} ON Student
+        WHEN {" OR ".join(f"old.{c} IS NOT new.{c}" for c in names)} BEGIN
+        INSERT INTO student_fts(student_fts, rowid, {cols}) VALUES ('delete', old.student_id, {old});
+        INSERT INTO student_fts(rowid, {cols}) VALUES (new.student_id, {new}); END""")
+    conn.execute("INSERT INTO student_fts(student_fts) VALUES ('rebuild')")
+    # rank = bm25 with a name hit worth more than a parent's name, worth more than address/phone/batch
+    conn.execute("INSERT INTO student_fts(student_fts, rank) VALUES ('rank', 'bm25(10.0, 3.0, 3.0, 1.0, 1.0, 1.0)')")
+
+
+NAME_KINDS = {"students": (1, "Student", "student_id"), "instructors": (2, "Instructors", "instructor_id")}
+
+def _search_queue(kind, key, row):
+    return f"INSERT OR IGNORE INTO search_pending (kind, ref) VALUES ({kind}, {row}.{key});"
+
+@migration(6, "trigram name index")
+def _name_grams(conn):
+    # one row per (kind, trigram, id) plus a per-trigram row count. Trigrams need Python, which
+    # a plain sqlite3 shell does not have, so plain-SQL triggers only queue the changed key and
+    # the app brings name_grams up to date (sync_search) in the same transaction as its own
+    # writes, at start-up and before a name search
+    conn.execute("""CREATE TABLE name_grams (kind INTEGER NOT NULL, gram TEXT NOT NULL, ref INTEGER NOT NULL,
+        PRIMARY KEY (kind, gram, ref)) WITHOUT ROWID""")
+    conn.execute("CREATE INDEX idx_name_grams_ref ON name_grams(kind, ref)")
+    conn.execute("""CREATE TABLE name_gram_counts (kind INTEGER NOT NULL, gram TEXT NOT NULL, n INTEGER NOT NULL,
+        PRIMARY KEY (kind, gram)) WITHOUT ROWID""")
+    conn.execute("""CREATE TABLE search_pending (kind INTEGER NOT NULL, ref INTEGER NOT NULL,
+        PRIMARY KEY (kind, ref)) WITHOUT ROWID""")
+    for kind, table, key in NAME_KINDS.values():
+        queue = lambda row: _search_queue(kind, key, row)
+        conn.execute(f"CREATE TRIGGER {table.lower()}_search_insert AFTER INSERT ON {table} BEGIN {queue('new')} END")
+        conn.execute(f"""CREATE TRIGGER {table.lower()}_search_update AFTER UPDATE OF name, {key} ON {table}
+            WHEN old.name IS NOT new.name OR old.{key} IS NOT new.{key} BEGIN {queue('old')} {queue('new')} END""")
+        conn.execute(f"CREATE TRIGGER {table.lower()}_search_delete AFTER DELETE ON {table} BEGIN {queue('old')} END")
+        conn.executemany("INSERT INTO name_grams (kind, gram, ref) VALUES (?, ?, ?)",
+                         ((kind, gram, ref) for ref, name in conn.execute(f"SELECT {key}, name FROM {table}")
+                          for gram in name_trigrams(name)))
+    conn.execute("INSERT INTO name_gram_counts (kind, gram, n) SELECT kind, gram, COUNT(*) FROM name_grams GROUP BY kind, gram")
+
+
+@migration(7, "phone index")
+def _phones(conn):
+    # canonical numbers of students and instructors, kept through search_pending like name_grams:
+    # inserts and deletes are queued already, a changed number queues its row too
+    conn.execute("""CREATE TABLE phones (kind INTEGER NOT NULL, ref INTEGER NOT NULL, phone TEXT NOT NULL,
+        rev TEXT NOT NULL, PRIMARY KEY (kind, ref)) WITHOUT ROWID""")
+    conn.execute("CREATE INDEX idx_phones_phone ON phones(kind, phone)")
+    conn.execute("CREATE INDEX idx_phones_rev ON phones(kind, rev)")
+    for kind, table, key in NAME_KINDS.values():
+        conn.execute(f"""CREATE TRIGGER {table.lower()}_phone_update AFTER UPDATE OF mobile_no ON {table}
+            WHEN old.mobile_no IS NOT new.mobile_no BEGIN {_search_queue(kind, key, 'new')} END""")
+        conn.executemany("INSERT INTO phones (kind, ref, phone, rev) VALUES (?, ?, ?, ?)",
+                         ((kind, ref, phone, phone_rev(phone)) for ref, phone in
+                          ((ref, phone_key(text)) for ref, text in conn.execute(f"SELECT {key}, mobile_no FROM {table}"))
+                          if phone))
+
+
+@migration(8, "filter indexes")
+def _filter_indexes(conn):
+    _create_indexes(conn, FILTER_INDEXES)
+    # sqlite_stat1 tells the planner a filter on a handful of blood groups keeps most of the
+    # table, so a sorted page walks the sort index instead of sorting every filtered row;
+    # ConnectionManager.close() keeps it current with PRAGMA optimize
+    conn.execute("PRAGMA analysis_limit = 1000")
+    conn.execute("ANALYZE")
+
+
+# (table, key, copy column, foreign key, named table, its key, its name column)
+NAME_COPIES = (("Student", "student_id", "course_sort", "course_id", "Course", "course_id", "course_name"),
+               ("Result", "result_id", "student_sort", "student_id", "Student", "student_id", "name"))
+
+@migration(9, "name sort copies")
+def _name_copies(conn):
+    # a list sorted by a joined name needs that name on its own rows to seek an index;
+    # plain-SQL triggers keep the copy, so every client that writes keeps it right
+    for table, key, copy, fk, named, named_key, name in NAME_COPIES:
+        lookup = lambda row: f"IFNULL((SELECT {name} FROM {named} WHERE {named_key} = {row}.{fk}), '')"
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {copy} TEXT NOT NULL DEFAULT ''")
+        conn.execute(f"""CREATE TRIGGER {table.lower()}_{copy}_insert AFTER INSERT ON {table}
+            WHEN new.{fk} IS NOT NULL BEGIN
+            UPDATE {table} SET {copy} = {lookup('new')} WHERE {key} = new.{key}; END""")
+        conn.execute(f"""CREATE TRIGGER {table.lower()}_{copy}_update AFTER UPDATE OF {fk} ON {table}
+            WHEN old.{fk} IS NOT new.{fk} BEGIN
+            UPDATE {table} SET {copy} = {lookup('new')} WHERE {key} = new.{key}; END""")
+        conn.execute(f"""CREATE TRIGGER {named.lower()}_rename_{table.lower()} AFTER UPDATE OF {name} ON {named}
+            WHEN old.{name} IS NOT new.{name} BEGIN
+            UPDATE {table} SET {copy} = new.{name} WHERE {fk} = new.{named_key}; END""")
+        conn.execute(f"UPDATE {table} SET {copy} = {lookup(table)} WHERE {fk} IS NOT NULL")
+    _create_indexes(conn, NAME_SORT_INDEXES)
+
+
+# ------------------------- Indexes -------------------------
+
+# Each index migration creates one of these lists. A released list never changes: a new
+# index goes into a new list with its own migration. INDEXES, their union, is what
+# check-plans expects every database to have.
+
+BASE_INDEXES = {  # migration 2
+    "idx_student_course": "Student(course_id)",
+    "idx_student_instructor": "Student(instructor_id)",
+    "idx_student_name": "Student(name)",
+    "idx_result_student": "Result(student_id)",
+    "idx_result_course": "Result(course_id)",
+    "idx_result_instructor": "Result(instructor_id)",
+    "idx_instructors_name": "Instructors(name)",
+}
+# list sorting: nullable columns sort by IFNULL(...) so keyset seeks never compare NULL
+SORT_INDEXES = {  # migration 3
+    "idx_student_batch_sort": "Student(IFNULL(batch_no, ''))",
+    "idx_student_course_sort": "Student(IFNULL(course_id, 0))",
+    "idx_result_grade_sort": "Result(IFNULL(grade, ''))",
+}
+# type-ahead pickers: LIKE 'abc%' is case-insensitive, so it only seeks a NOCASE index
+PICKER_INDEXES = {  # migration 4
+    "idx_student_name_nocase": "Student(name COLLATE NOCASE)",
+    "idx_course_name_nocase": "Course(course_name COLLATE NOCASE)",
+    "idx_instructors_name_nocase": "Instructors(name COLLATE NOCASE)",
+}
+# list filters: IN (...) on the same IFNULL(...) expressions, and their GROUP BY value lists
+FILTER_INDEXES = {  # migration 8
+    "idx_student_blood_filter": "Student(IFNULL(blood_group, ''))",
+    "idx_student_instructor_filter": "Student(IFNULL(instructor_id, 0))",
+    "idx_instructors_blood_filter": "Instructors(IFNULL(blood_group, ''))",
+    "idx_instructors_expertise_filter": "Instructors(IFNULL(expertise, ''))",
+    "idx_result_course_filter": "Result(IFNULL(course_id, 0))",
+    "idx_result_instructor_filter": "Result(IFNULL(instructor_id, 0))",
+}
+# lists sorted by a joined name: the copies NAME_COPIES keeps on the base rows
+NAME_SORT_INDEXES = {  # migration 9
+    "idx_student_course_name_sort": "Student(course_sort)",
+    "idx_result_student_name_sort": "Result(student_sort)",
+}
+INDEXES = {**BASE_INDEXES, **SORT_INDEXES, **PICKER_INDEXES, **FILTER_INDEXES, **NAME_SORT_INDEXES}
+
+
+# ------------------------- Query registry -------------------------
+
+class QueryRegistry:
+    """Named, parameterized statements shared by the whole app.
+
+    SQL is whitespace-normalized on registration so every caller sends byte-identical
+    text and hits sqlite3's per-connection statement cache. Q(name) returns the SQL
+    and counts the call.
+    """
+    def __init__(self):
+        self._sql = {}; self._names = {}; self.scan_ok = set(); self.calls = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def register(self, name, sql, scan_ok=False):
+        sql = self._sql[name] = " ".join(sql.split()); self._names[sql] = name
+        if scan_ok: self.scan_ok.add(name)
+        return sql
+
+    def name_of(self, sql):
+        """Registry name for sql, or the statement itself (shortened) when it is ad hoc."""
+        return self._names.get(sql) or " ".join(sql.split())[:80]
+
+    def __call__(self, name):
+        with self._lock: self.calls[name] += 1
+        return self._sql[name]
+
+    def __getitem__(self, name):
+        return self._sql[name]
+
+    def __len__(self):
+        return len(self._sql)
+
+    def items(self):
+        return self._sql.items()
+
+    def stats(self):
+        return sorted(self.calls.items(), key=lambda kv: -kv[1])
+
+Q = QueryRegistry()
+
+# Every statement the app issues. Whole-table listings are expected to scan.
+for _name, _sql, _scan_ok in (
+    ("users.insert", "INSERT INTO users (name,email,password) VALUES (?,?,?)", False),
+    ("users.login", "SELECT id,name FROM users WHERE email=? AND password=?", False),
+    ("courses.list", "SELECT course_id, course_name, duration, course_price FROM Course ORDER BY course_id", True),
+    ("courses.insert", "INSERT INTO Course (course_name,duration,course_price) VALUES (?,?,?)", False),
+    ("courses.update", "UPDATE Course SET course_name=?,duration=?,course_price=? WHERE course_id=?", False),
+    ("courses.delete", "DELETE FROM Course WHERE course_id=?", False),
+    ("courses.names", "SELECT course_id, course_name FROM Course ORDER BY course_name", True),
+    ("instructors.list", """SELECT instructor_id, name, father_name, mother_name, blood_group, mobile_no, expertise
+        FROM Instructors ORDER BY instructor_id""", True),
+    ("instructors.insert", """INSERT INTO Instructors (name,father_name,mother_name,blood_group,mobile_no,expertise)
+        VALUES (?,?,?,?,?,?)""", False),
+    ("instructors.update", """UPDATE Instructors SET name=?,father_name=?,mother_name=?,blood_group=?,mobile_no=?,expertise=?
+        WHERE instructor_id=?""", False),
+    ("instructors.delete", "DELETE FROM Instructors WHERE instructor_id=?", False),
+    ("instructors.names", "SELECT instructor_id, name FROM Instructors ORDER BY name", True),
+    ("students.list_joined", """
+        SELECT s.student_id, s.name, s.father_name, s.mother_name, s.address, s.blood_group, s.mobile_no,
+               c.course_name, i.name, s.batch_no
+        FROM Student s
+        LEFT JOIN Course c ON s.course_id=c.course_id
+        LEFT JOIN Instructors i ON s.instructor_id=i.instructor_id
+        ORDER BY s.student_id""", True),
+    ("students.insert", """INSERT INTO Student (name,father_name,mother_name,address,blood_group,mobile_no,course_id,instructor_id,batch_no)
+        VALUES (?,?,?,?,?,?,?,?,?)""", False),
+    ("students.update", """UPDATE Student SET name=?,father_name=?,mother_name=?,address=?,blood_group=?,mobile_no=?,
+        course_id=?,instructor_id=?,batch_no=? WHERE student_id=?""", False),
+    ("students.delete", "DELETE FROM Student WHERE student_id=?", False),
+    ("results.list_joined", """
+        SELECT r.result_id, s.name, c.course_name, i.name, r.grade
+        FROM Result r
+        LEFT JOIN Student s ON r.student_id=s.student_id
+        LEFT JOIN Course c ON r.course_id=c.course_id
+        LEFT JOIN Instructors i ON r.instructor_id=i.instructor_id
+        ORDER BY r.result_id""", True),
+    ("results.insert", "INSERT INTO Result (student_id,course_id,grade,instructor_id) VALUES (?,?,?,?)", False),
+    ("results.update", "UPDATE Result SET student_id=?,course_id=?,grade=?,instructor_id=? WHERE result_id=?", False),
+    ("results.delete", "DELETE FROM Result WHERE result_id=?", False),
+):
+    Q.register(_name, _sql, _scan_ok)
+
+
+# ------------------------- List views -------------------------
+
+def fts_query(text):
+    """FTS5 MATCH string for what a user typed: every word, as a prefix; None if no words."""
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{w}"*' for w in words) if words else None
+
+
+RANK = "rank"  # ListView sort column of a full-text search: best match first
+
+class ListQuery:
+    """A management-window list: display columns (key first), base table, joins and key.
+
+    ``hidden`` columns (foreign-key ids) follow the display columns in every row but
+    are not shown, so a selection can fill a form without looking names up again.
+    ``sorts`` maps a display column to the indexed base-table expression it sorts by;
+    a sorted list orders by (expression, key) and carries the expression as one more
+    trailing column so rows can be placed without another query. A joined name sorts
+    by the copy of it that NAME_COPIES keeps on the base row.
+    The joins must not change the row count (LEFT JOINs on a primary key), so counts
+    and key walks only touch the base table.
+    With ``fts`` (an FTS5 table whose rowid is the key) every query also has a
+    ``.match`` variant that joins the full-text matches and takes the MATCH string as
+    its first parameter; those can also be ordered by RANK, best match first.
+    ``filters`` maps a display column to the indexed base-table expression it filters
+    on, or to (expression, table, key, label) when the values are ids named in another
+    table. A filter is ``expression IN (SELECT value FROM json_each(?))`` with the
+    chosen values bound as one JSON array, so each set of filtered columns is one
+    statement per order whatever values are picked. The statements for a set are
+    registered when a list is first filtered that way (there are 2^n sets); check-plans
+    registers them all before it explains them.
+    """
+    def __init__(self, name, columns, base, key, joins="", hidden=(), sorts=None, fts=None, filters=None):
+        self.name = name; self.columns = columns; self.base = base; self.key = key; self.joins = joins
+        self.hidden = hidden; self.sorts = sorts or {}; self.fts = fts; self.tables = tables_read(f"FROM {base} {joins}")
+        self.filters = {c: f if isinstance(f, tuple) else (f,) for c, f in (filters or {}).items()}
+        self._wheres = set()
+        for col, (expr, *label) in self.filters.items():
+            pick = "g.v"; join = ""
+            if label:
+                table, id, text = label; pick = f"t.{text}"; join = f"LEFT JOIN {table} t ON t.{id} = g.v"
+            # one pass over the expression index; a few hundred distinct values at most
+            Q.register(f"{name}.distinct{self.suffix(col)}",
+                       f"SELECT g.v, {pick}, g.n FROM (SELECT {expr} AS v, COUNT(*) AS n FROM {base} GROUP BY {expr}) g "
+                       f"{join} ORDER BY 2", scan_ok=True)
+        self.where(())
+
+    def suffix(self, col=None, desc=False, match=False, where=()):
+        """Registry name suffix of one sort order and filter set: '' for the key ascending, unfiltered."""
+        w = lambda c: re.sub(r"\W+", "_", c)
+        return (("." + w(col) if col else "") + (".desc" if desc else "") +
+                (".where_" + "_".join(map(w, where)) if where else "") + (".match" if match else ""))
+
+    def where(self, cols):
+        """Register the statements for a list filtered on ``cols`` (a tuple in ``filters`` order)."""
+        if cols in self._wheres: return
+        name, base, fts = self.name, self.base, self.fts
+        cond = " AND ".join(f"{self.filters[c][0]} IN (SELECT value FROM json_each(?))" for c in cols)
+        # a filter that keeps most of the table is counted fastest by a scan, and sqlite_stat1 says so
+        Q.register(f"{name}.count{self.suffix(where=cols)}",
+                   f"SELECT COUNT(*) FROM {base}" + (f" WHERE {cond}" if cond else ""), scan_ok=True)
+        for col in (None, *self.sorts):
+            for desc in (False, True): self._register(col, desc, where=cols)
+        if fts:
+            Q.register(f"{name}.count{self.suffix(match=True, where=cols)}",
+                       f"SELECT COUNT(*) FROM {base} JOIN (SELECT rowid AS id FROM {fts} WHERE {fts} MATCH ?) m "
+                       f"ON m.id = {self.key} WHERE {cond}" if cols else f"SELECT COUNT(*) FROM {fts} WHERE {fts} MATCH ?")
+            for col in (None, RANK, *self.sorts):
+                for desc in (False, True): self._register(col, desc, match=True, where=cols)
+        self._wheres.add(cols)
+
+    def where_all(self):
+        """Register every set of filtered columns."""
+        for r in range(len(self.filters) + 1):
+            for where in itertools.combinations(self.filters, r): self.where(where)
+
+    def _register(self, col, desc, match=False, where=()):
+        name, base, joins, key = self.name, self.base, self.joins, self.key
+        if match: base += f" JOIN (SELECT rowid AS id, rank FROM {self.fts} WHERE {self.fts} MATCH ?) m ON m.id = {key}"
+        order = [("m.rank" if col == RANK else self.sorts[col]), key] if col else [key]
+        sel = ", ".join([*self.columns, *self.hidden, *order[:-1]]); keys = ", ".join(order)
+        fwd, back, cmp, rcmp = ("DESC", "ASC", "<", ">") if desc else ("ASC", "DESC", ">", "<")
+        by = lambda d: ", ".join(f"{c} {d}" for c in order)
+        # (expr, key) > (?, ?) spelled out: SQLite seeks expression indexes only on a plain range
+        seek = f"{order[0]} {cmp}= ? AND ({order[0]} {cmp} ? OR {key} {cmp} ?)" if col else f"{key} {cmp} ?"
+        before = f"{order[0]} {rcmp}= ? AND ({order[0]} {rcmp} ? OR {key} {rcmp} ?)" if col else f"{key} {rcmp} ?"
+        # filter parameters come right after the MATCH string, ahead of the seek
+        filt = [f"{self.filters[c][0]} IN (SELECT value FROM json_each(?))" for c in where]
+        w = lambda *conds: " WHERE " + " AND ".join([*filt, *conds]) if filt or conds else ""
+        sfx = self.suffix(col, desc, match, where)
+        Q.register(f"{name}.first{sfx}", f"SELECT {sel} FROM {base} {joins}{w()} ORDER BY {by(fwd)} LIMIT ?")
+        Q.register(f"{name}.after{sfx}", f"SELECT {sel} FROM {base} {joins}{w(seek)} ORDER BY {by(fwd)} LIMIT ?")
+        Q.register(f"{name}.last{sfx}", f"SELECT {sel} FROM {base} {joins}{w()} ORDER BY {by(back)} LIMIT ?")
+        Q.register(f"{name}.keys_first{sfx}", f"SELECT {keys} FROM {base}{w()} ORDER BY {by(fwd)} LIMIT ?")
+        Q.register(f"{name}.keys_after{sfx}", f"SELECT {keys} FROM {base}{w(seek)} ORDER BY {by(fwd)} LIMIT ?")
+        Q.register(f"{name}.prev{sfx}", f"SELECT {sel} FROM {base} {joins}{w(before)} ORDER BY {by(back)} LIMIT ?")
+        Q.register(f"{name}.keys_last{sfx}", f"SELECT {keys} FROM {base}{w()} ORDER BY {by(back)} LIMIT ?")
+        Q.register(f"{name}.keys_before{sfx}", f"SELECT {keys} FROM {base}{w(before)} ORDER BY {by(back)} LIMIT ?")
+        Q.register(f"{name}.before{sfx}", f"SELECT COUNT(*) FROM {base}{w(before)}")
+        if not desc: Q.register(f"{name}.row{sfx}", f"SELECT {sel} FROM {base} {joins}{w(f'{key} = ?')}")
+
+    def view(self, block=100):
+        return ListView(self, block)
+
+    def prefetch(self, block=100):
+        """Read the row count and first block into the query cache before the list is shown."""
+        view = self.view(block); view.count(); view.rows(0)
+
+
+class _Desc:
+    """Sort wrapper that reverses comparisons, for bisecting a descending list."""
+    __slots__ = ("v",)
+    def __init__(self, v): self.v = v
+    def __lt__(self, other): return other.v < self.v
+    def __eq__(self, other): return self.v == other.v
+
+
+# What one ListView read runs against, taken once so a header click or filter change on the
+# Tk thread cannot change the statement, its parameters or the block size halfway through.
+_ReadState = namedtuple("_ReadState", "sort_col desc match where values block version")
+
+
+class ListView:
+    """Positional, block-wise (page-wise) access to a ListQuery for a virtual list.
+
+    Blocks are always read with a keyset seek from the last position of the previous
+    block, never with OFFSET; a position is the key, or (sort value, key) when sorted.
+    The last positions of the leading full blocks are remembered, so scrolling on is
+    one index seek per block and a jump walks only keys past the furthest known block,
+    ``walk_blocks`` blocks per statement. Near the end of the list the same is done
+    backwards: the first positions of the trailing blocks are remembered by their
+    distance from the end, so paging back from the last page is one seek per block too.
+
+    Reads run on worker threads, each against a snapshot of the order, search and
+    filters (_ReadState); what they learn is only remembered if nothing changed
+    meanwhile. cancel() interrupts the statement in flight (see Interrupter) and ends a
+    walk. search() narrows the list to full-text matches and composes with sorting and
+    paging, since the matches are joined into the same seeks; filter() does the same
+    with the query's column filters.
+    """
+    walk_blocks = 50
+
+    def __init__(self, query, block=100):
+        self.query = query; self.block = block; self._anchors = []; self._back = {}; self._back_total = None
+        self._lock = threading.Lock(); self._version = 0; self._reads = Interrupter()
+        self.sort_col = None; self.desc = False; self.match = None; self.filters = {}
+
+    def _clear(self):
+        self._anchors = []; self._back = {}; self._version += 1
+
+    def reset(self):
+        with self._lock: self._clear()
+
+    def sort(self, col=None, desc=False):
+        """Order by one of the query's sort columns (None: the key) and start over."""
+        with self._lock: self.sort_col = col; self.desc = desc; self._clear()
+
+    def search(self, text):
+        """Show only rows matching ``text`` ordered by RANK, or every row again for ''.
+
+        Returns False when that is already the search; a header sort chosen during a
+        search is kept until the search is cleared.
+        """
+        match = fts_query(text) if self.query.fts else None
+        if match == self.match: return False
+        with self._lock:
+            if match is None: self.sort_col, self.desc = (None, False) if self.sort_col == RANK else (self.sort_col, self.desc)
+            elif self.match is None: self.sort_col = RANK; self.desc = False
+            self.match = match; self._clear()
+        return True
+
+    def filter(self, col, values=None):
+        """Show only rows whose ``col`` is one of ``values`` (from distinct()); None drops the filter.
+
+        Returns False when that is already the filter on ``col``.
+        """
+        values = tuple(values) if values is not None else None
+        if self.filters.get(col) == values: return False
+        with self._lock:
+            if values is None: del self.filters[col]
+            else: self.filters[col] = values
+            self.query.where(tuple(c for c in self.query.filters if c in self.filters))
+            self._clear()
+        return True
+
+    def distinct(self, col):
+        """[(value, label, count)] of a filterable column over the whole table, cached until it changes."""
+        return [(v, str(label) if label not in (None, "") else "(blank)" if v in (0, "") else str(v), n)
+                for v, label, n in self._fetch(Q(f"{self.query.name}.distinct{self.query.suffix(col)}"))]
+
+    @property
+    def narrowed(self):
+        """Searched or filtered: an updated row may enter or leave the list."""
+        return bool(self.match or self.filters)
+
+    @property
+    def ranked(self):
+        """Ordered by RANK: bm25 scores shift with every write to the table, so no cached
+        position survives a write."""
+        return self.sort_col == RANK
+
+    def cancel(self):
+        """Stop this view's reads for good: the running statement fails with 'interrupted'."""
+        self._reads.cancel()
+
+    def abort(self):
+        """Stop the reads in flight but not later ones, e.g. when the window is hidden: the
+        running statement fails with 'interrupted' and a walk ends unremembered."""
+        with self._lock: self._version += 1
+        self._reads.abort()
+
+    def _fetch(self, q, p=()):
+        with self._reads.active(): return fetch_all(q, p)
+
+    def known(self):
+        """Number of blocks whose boundaries are known (progress of a jump)."""
+        return len(self._anchors)
+
+    def _state(self):
+        with self._lock:
+            where = tuple(c for c in self.query.filters if c in self.filters)
+            return _ReadState(self.sort_col, self.desc, self.match, where,
+                              tuple(json.dumps(self.filters[c]) for c in where), self.block, self._version)
+
+    def _q(self, st, op):
+        sfx = self.query.suffix(st.sort_col if op != "count" else None, st.desc and op not in ("row", "count"),
+                                bool(st.match), st.where)
+        return Q(f"{self.query.name}.{op}{sfx}")
+
+    @staticmethod
+    def _p(st, *params):
+        return (st.match, *st.values, *params) if st.match else (*st.values, *params)
+
+    @staticmethod
+    def _params(st, pos):
+        return (pos[0], pos[0], pos[1]) if st.sort_col else (pos,)
+
+    @staticmethod
+    def _pos(st, row):
+        return (row[-1], row[0]) if st.sort_col else row[0]
+
+    def pos(self, row):
+        """Position of a row in the current order."""
+        return (row[-1], row[0]) if self.sort_col else row[0]
+
+    def _order(self, pos):
+        return _Desc(pos) if self.desc else pos
+
+    def index(self, rows, pos):
+        """Where ``pos`` goes in a list of rows in the current order."""
+        return bisect.bisect_left(rows, self._order(pos), key=lambda r: self._order(self.pos(r)))
+
+    def count(self):
+        st = self._state()
+        return self._fetch(self._q(st, "count"), self._p(st))[0][0]
+
+    def row(self, key):
+        """The list row for one key, or None if it no longer exists."""
+        return self._row(self._state(), key)
+
+    def _row(self, st, key):
+        rows = self._fetch(self._q(st, "row"), self._p(st, key))
+        return rows[0] if rows else None
+
+    def locate(self, key):
+        """(position, row) of a key in the current order, or None if it is not in the list.
+
+        The position is one range COUNT on the index the order already seeks.
+        """
+        st = self._state(); row = self._row(st, key)
+        if row is None: return None
+        return self._fetch(self._q(st, "before"), self._p(st, *self._params(st, self._pos(st, row))))[0][0], row
+
+    def rows(self, index, total=None):
+        """Rows at positions [index * block, (index + 1) * block).
+
+        Given the current ``total``, a block nearer the end than the known boundaries is
+        read backwards (_rows_back), so the last page and the ones before it cost the
+        same as the first. [] when the order or filters change during the read.
+        """
+        st = self._state()
+        if index == 0:
+            rows = self._fetch(self._q(st, "first"), self._p(st, st.block))
+        elif total is not None and index > len(self._anchors) and self._back_cheaper(st, index, total):
+            return self._rows_back(st, index, total)
+        else:
+            anchor = self._anchor(st, index - 1)
+            if anchor is None: return []
+            rows = self._fetch(self._q(st, "after"), self._p(st, *self._params(st, anchor), st.block))
+        self.seen(index, rows, st.version)
+        return rows
+
+    def _back_cheaper(self, st, index, total):
+        """Whether block ``index`` is fewer keys away from the end (or a known position
+        counted from it) than from the furthest known block boundary."""
+        after = total - (index + 1) * st.block  # rows past the block
+        with self._lock:
+            back = self._back if self._back_total == total else {}
+            known = max((c for c in back if c <= after), default=0)
+            return after - known <= (index - len(self._anchors)) * st.block
+
+    def _rows_back(self, st, index, total):
+        """Block ``index`` read backwards: the last rows, or those before the next block."""
+        after = max(0, total - (index + 1) * st.block); n = min(st.block, total - index * st.block)
+        if n <= 0: return []
+        if after == 0:
+            rows = self._fetch(self._q(st, "last"), self._p(st, n))[::-1]
+        else:
+            start = self._from_end(st, after, total)
+            if start is None: return []
+            rows = self._fetch(self._q(st, "prev"), self._p(st, *self._params(st, start), n))[::-1]
+        with self._lock:
+            if not rows or st.version != self._version: return rows
+            if self._back_total != total: self._back = {}; self._back_total = total
+            self._back[after + len(rows)] = self._pos(st, rows[0])
+        return rows
+
+    def _from_end(self, st, count, total):
+        """First position of the last ``count`` rows, walking keys back from the end or from
+        the nearest position already known; block starts met on the way are remembered."""
+        B = st.block
+        while not self._reads.cancelled:
+            with self._lock:
+                if st.version != self._version: return None  # the list changed under the walk
+                if self._back_total != total: self._back = {}; self._back_total = total
+                back = self._back
+                if count in back: return back[count]
+                known = max((c for c in back if c < count), default=0)
+            need = min(count - known, self.walk_blocks * B)
+            keys = self._fetch(self._q(st, "keys_last"), self._p(st, need)) if not known else \
+                   self._fetch(self._q(st, "keys_before"), self._p(st, *self._params(st, back[known]), need))
+            with self._lock:
+                if st.version != self._version or back is not self._back: continue
+                for j, k in enumerate(keys, known + 1):
+                    if j == count or (total - j) % B == 0: back[j] = tuple(k) if st.sort_col else k[0]
+            if len(keys) < need: return back.get(count)
+        return None
+
+    def seen(self, index, rows, version=None):
+        """Remember where block ``index`` ends if it is full and the block before it is known.
+
+        With ``version``, rows read before a forget()/reset() are ignored.
+        """
+        with self._lock:
+            if version is not None and version != self._version: return
+            if len(rows) == self.block and index == len(self._anchors): self._anchors.append(self.pos(rows[-1]))
+
+    def block_of(self, pos):
+        """First block that can hold ``pos``: every block before it is full and ends before it."""
+        return bisect.bisect_left(self._anchors, self._order(pos), key=self._order)
+
+    def forget(self, index):
+        """Forget block boundaries from block ``index`` on, after a row was added or removed there.
+
+        Positions counted from the end are all dropped: the next total will not match them.
+        """
+        with self._lock: del self._anchors[index:]; self._back = {}; self._version += 1
+
+    def _anchor(self, st, index):
+        """Last position of block ``index``, walking keys from the furthest known block if needed."""
+        B = st.block
+        while not self._reads.cancelled:
+            with self._lock:
+                if st.version != self._version: return None  # the list changed under the walk
+                anchors = self._anchors
+                if index < len(anchors): return anchors[index]
+                start = len(anchors) - 1
+            need = min(index - start, self.walk_blocks) * B
+            keys = self._fetch(self._q(st, "keys_first"), self._p(st, need)) if start < 0 else \
+                   self._fetch(self._q(st, "keys_after"), self._p(st, *self._params(st, anchors[start]), need))
+            with self._lock:
+                if st.version != self._version: return None
+                anchors.extend(tuple(keys[k]) if st.sort_col else keys[k][0] for k in range(B - 1, len(keys), B))
+            if len(keys) < need: return anchors[index] if index < len(anchors) else None
+        return None
+
+LISTS = {
+    "courses": ListQuery("courses", ["course_id", "course_name", "duration", "course_price"], "Course", "course_id",
+                         sorts={"course_name": "course_name"}),
+    "instructors": ListQuery("instructors", ["instructor_id", "name", "father_name", "mother_name", "blood_group",
+                                             "mobile_no", "expertise"], "Instructors", "instructor_id",
+                             sorts={"name": "name"},
+                             filters={"blood_group": "IFNULL(blood_group, '')", "expertise": "IFNULL(expertise, '')"}),
+    "students": ListQuery("students", ["s.student_id", "s.name", "s.father_name", "s.mother_name", "s.address",
+                                       "s.blood_group", "s.mobile_no", "c.course_name", "i.name", "s.batch_no"],
+                          "Student s", "s.student_id",
+                          "LEFT JOIN Course c ON s.course_id=c.course_id "
+                          "LEFT JOIN Instructors i ON s.instructor_id=i.instructor_id",
+                          hidden=["s.course_id", "s.instructor_id"],
+                          sorts={"s.name": "s.name", "c.course_name": "s.course_sort",
+                                 "s.batch_no": "IFNULL(s.batch_no, '')"}, fts="student_fts",
+                          filters={"s.blood_group": "IFNULL(s.blood_group, '')",
+                                   "c.course_name": ("IFNULL(s.course_id, 0)", "Course", "course_id", "course_name"),
+                                   "i.name": ("IFNULL(s.instructor_id, 0)", "Instructors", "instructor_id", "name"),
+                                   "s.batch_no": "IFNULL(s.batch_no, '')"}),
+    "results": ListQuery("results", ["r.result_id", "s.name", "c.course_name", "i.name", "r.grade"],
+                         "Result r", "r.result_id",
+                         "LEFT JOIN Student s ON r.student_id=s.student_id "
+                         "LEFT JOIN Course c ON r.course_id=c.course_id "
+                         "LEFT JOIN Instructors i ON r.instructor_id=i.instructor_id",
+                         hidden=["r.student_id", "r.course_id", "r.instructor_id"],
+                         sorts={"s.name": "r.student_sort", "r.grade": "IFNULL(r.grade, '')"},
+                         filters={"c.course_name": ("IFNULL(r.course_id, 0)", "Course", "course_id", "course_name"),
+                                  "i.name": ("IFNULL(r.instructor_id, 0)", "Instructors", "instructor_id", "name"),
+                                  "r.grade": "IFNULL(r.grade, '')"}),
+}
+
+
+# ------------------------- Lookups -------------------------
+
+class Lookup:
+    """Id/name lookups on one table for the type-ahead pickers, shared by every window.
+
+    Small reference tables (``preload``) are read once and searched in memory; larger
+    ones are searched by name prefix through a NOCASE index (LIKE 'abc%') and only the
+    last ``keep`` rows seen are remembered. Either way name_of() and id_of() are dict
+    lookups by id and by display label, and change events keep the remembered rows
+    current. search() also returns the row whose id was typed as digits.
+    """
+    def __init__(self, name, table, key, label, preload=False, keep=5000):
+        self.name = name; self.table = table; self.preload = preload; self.keep = keep
+        self._lock = threading.RLock(); self._loaded = False
+        self._by_id = OrderedDict(); self._by_label = {}; self._sorted = []  # (casefolded name, id) when preloaded
+        # the plan depends on the bound pattern: a prefix seeks the index, a leading % would scan
+        Q.register(f"{name}.search", f"SELECT {key}, {label} FROM {table} WHERE {label} LIKE ? ESCAPE '\\' "
+                                     f"ORDER BY {label} COLLATE NOCASE LIMIT ?", scan_ok=True)
+        Q.register(f"{name}.by_id", f"SELECT {key}, {label} FROM {table} WHERE {key} = ?")
+        events.subscribe(table, self._on_change)
+
+    @staticmethod
+    def label(id, name):
+        """Display key shown in pickers."""
+        return f"{id} - {name}"
+
+    def remember(self, id, name):
+        with self._lock:
+            self._forget(id); self._by_id[id] = name; self._by_label[self.label(id, name)] = id
+            if self.preload: bisect.insort(self._sorted, (name.casefold(), id))
+            while len(self._by_id) > self.keep and not self.preload:
+                old, old_name = self._by_id.popitem(last=False); self._by_label.pop(self.label(old, old_name), None)
+
+    def _forget(self, id):
+        name = self._by_id.pop(id, None)
+        if name is None: return
+        self._by_label.pop(self.label(id, name), None)
+        if self.preload:
+            i = bisect.bisect_left(self._sorted, (name.casefold(), id))
+            if i < len(self._sorted) and self._sorted[i] == (name.casefold(), id): del self._sorted[i]
+
+    def _load(self):
+        with self._lock:
+            if self._loaded: return
+            rows = fetch_all(Q(f"{self.name}.names"))
+            self._by_id = OrderedDict(rows); self._by_label = {self.label(i, n): i for i, n in rows}
+            self._sorted = sorted((n.casefold(), i) for i, n in rows); self._loaded = True
+
+    def prefetch(self):
+        """Load a preloaded table ahead of its first search; other tables are read on demand."""
+        if self.preload: self._load()
+
+    def search(self, text, limit=20):
+        text = text.strip(); check_external_writes()
+        if self.preload:
+            self._load(); t = text.casefold(); rows = []
+            with self._lock:
+                if text.isdigit() and int(text) in self._by_id: rows.append((int(text), self._by_id[int(text)]))
+                for n, id in itertools.islice(self._sorted, bisect.bisect_left(self._sorted, (t,)), None):
+                    if len(rows) >= limit or not n.startswith(t): break
+                    if not rows or rows[0][0] != id: rows.append((id, self._by_id[id]))
+            return rows
+        rows = list(fetch_all(Q(f"{self.name}.by_id"), (int(text),))) if text.isdigit() else []
+        like = re.sub(r"([\\%_])", r"\\\1", text) + "%"
+        rows += [r for r in fetch_all(Q(f"{self.name}.search"), (like, limit)) if r not in rows]
+        for r in rows[:limit]: self.remember(*r)
+        return rows[:limit]
+
+    def name_of(self, id):
+        """Name for an id, or None if the row does not exist."""
+        check_external_writes()
+        with self._lock:
+            if id in self._by_id: self._by_id.move_to_end(id); return self._by_id[id]
+            if self.preload and self._loaded: return None
+        rows = fetch_all(Q(f"{self.name}.by_id"), (id,))
+        if rows: self.remember(*rows[0])
+        return rows[0][1] if rows else None
+
+    def id_of(self, label):
+        """Id for a display label, if that row has been seen."""
+        with self._lock: return self._by_label.get(label)
+
+    def _on_change(self, table, key):
+        with self._lock:
+            if key is None:  # unknown rows changed: start over on next use
+                self._by_id = OrderedDict(); self._by_label = {}; self._sorted = []; self._loaded = False
+                return
+            if key not in self._by_id and not (self.preload and self._loaded): return
+        rows = fetch_all(Q(f"{self.name}.by_id"), (key,))
+        with self._lock:
+            if rows: self.remember(*rows[0])
+            else: self._forget(key)
+
+
+LOOKUPS = {
+    "courses": Lookup("courses", "Course", "course_id", "course_name", preload=True),
+    "instructors": Lookup("instructors", "Instructors", "instructor_id", "name", preload=True),
+    "students": Lookup("students", "Student", "student_id", "name"),
+}
+
+
+# ------------------------- Fuzzy name search -------------------------
+
+Q.register("names.gram_counts", """SELECT gram, n FROM name_gram_counts
+    WHERE kind = ? AND gram IN (SELECT value FROM json_each(?))""")
+for _kind, (_k, _table, _key) in NAME_KINDS.items():
+    Q.register(f"{_kind}.fuzzy", f"""SELECT t.{_key}, t.name FROM name_grams g JOIN {_table} t ON t.{_key} = g.ref
+        WHERE g.kind = {_k} AND g.gram = ? LIMIT ?""")
+
+SEARCH_QUEUE = "search_pending"
+SEARCH_TABLES = {"name_grams", "name_gram_counts", "phones"}  # what sync_search writes
+Q.register("search.pending", "SELECT kind, ref FROM search_pending", scan_ok=True)
+Q.register("search.pending_any", "SELECT EXISTS (SELECT 1 FROM search_pending)")
+Q.register("search.done", "DELETE FROM search_pending WHERE kind = ? AND ref = ?")
+Q.register("names.grams_of", "SELECT gram FROM name_grams WHERE kind = ? AND ref = ?")
+Q.register("names.gram_drop", "DELETE FROM name_grams WHERE kind = ? AND gram = ? AND ref = ?")
+Q.register("names.gram_add", "INSERT INTO name_grams (kind, gram, ref) VALUES (?, ?, ?)")
+Q.register("names.count_down", "UPDATE name_gram_counts SET n = n - 1 WHERE kind = ? AND gram = ?")
+Q.register("names.count_up", """INSERT INTO name_gram_counts (kind, gram, n) VALUES (?, ?, 1)
+    ON CONFLICT (kind, gram) DO UPDATE SET n = n + 1""")
+for _kind, (_k, _table, _key) in NAME_KINDS.items():
+    Q.register(f"{_kind}.search_row", f"SELECT name, mobile_no FROM {_table} WHERE {_key} = ?")
+Q.register("phones.drop", "DELETE FROM phones WHERE kind = ? AND ref = ?")
+Q.register("phones.add", "INSERT INTO phones (kind, ref, phone, rev) VALUES (?, ?, ?, ?)")
+
+def _sync_search(conn):
+    """Re-derive name_grams, name_gram_counts and phones for the rows the triggers queued
+    in search_pending, inside the caller's transaction; returns the tables written."""
+    pending = conn.execute(Q("search.pending")).fetchall()
+    if not pending: return set()
+    kinds = {k: kind for kind, (k, _, _) in NAME_KINDS.items()}
+    for k, ref in pending:
+        row = conn.execute(Q(f"{kinds[k]}.search_row"), (ref,)).fetchone()
+        old = {g for g, in conn.execute(Q("names.grams_of"), (k, ref))}
+        new = name_trigrams(row[0]) if row else frozenset()
+        conn.executemany(Q("names.gram_drop"), [(k, g, ref) for g in old - new])
+        conn.executemany(Q("names.count_down"), [(k, g) for g in old - new])
+        conn.executemany(Q("names.gram_add"), [(k, g, ref) for g in new - old])
+        conn.executemany(Q("names.count_up"), [(k, g) for g in new - old])
+        phone = phone_key(row[1]) if row else None
+        conn.execute(Q("phones.drop"), (k, ref))
+        if phone: conn.execute(Q("phones.add"), (k, ref, phone, phone_rev(phone)))
+        conn.execute(Q("search.done"), (k, ref))
+    return SEARCH_TABLES | {SEARCH_QUEUE}
+
+def sync_search():
+    """Apply what writers outside this app left in search_pending; one cached read when empty."""
+    if not fetch_all(Q("search.pending_any"))[0][0]: return
+    m = db()
+    with m.writer() as conn:
+        if conn.in_transaction: return  # the enclosing transaction syncs before it commits
+        synced = set()
+        try:
+            m.call("BEGIN IMMEDIATE", lambda: conn.execute("BEGIN IMMEDIATE"))
+            synced = _sync_search(conn)
+            m.call("COMMIT", lambda: conn.execute("COMMIT"))
+        except BaseException:
+            if conn.in_transaction: conn.execute("ROLLBACK")
+            raise
+        finally:
+            m.cache.invalidate(synced | {SEARCH_QUEUE})
+
+def fuzzy_names(kind, text, limit=10, threshold=0.3, candidates=2000):
+    """Names of ``kind`` ('students' or 'instructors') like ``text``: [(id, name, score)], best first.
+
+    Names are compared by trigram Jaccard similarity of their normalize_name() keys. A
+    name at least ``threshold`` similar shares at least m = ceil(threshold * n) of the
+    query's n trigrams, so it holds one of the query's n - m + 1 rarest trigrams. Only
+    names listed under those in name_grams are read and scored, rarest trigram first,
+    until ``candidates`` names have been seen.
+    """
+    grams = name_trigrams(text)
+    if not grams: return []
+    sync_search()
+    counts = dict(fetch_all(Q("names.gram_counts"), (NAME_KINDS[kind][0], json.dumps(sorted(grams)))))
+    need = max(1, math.ceil(threshold * len(grams)))
+    rare = [g for g in sorted(grams, key=lambda g: counts.get(g, 0))[:len(grams) - need + 1] if counts.get(g)]
+    seen = set(); scored = []
+    for gram in rare:
+        for id, name in fetch_all(Q(f"{kind}.fuzzy"), (gram, candidates - len(seen))):
+            if id in seen: continue
+            seen.add(id); score = similarity(grams, name_trigrams(name))
+            if score >= threshold: scored.append((id, name, round(score, 3)))
+        if len(seen) >= candidates: break
+    scored.sort(key=lambda r: (-r[2], r[1]))
+    return scored[:limit]
+
+
+# ------------------------- Phone lookup -------------------------
+
+for _kind, (_k, _table, _key) in NAME_KINDS.items():
+    _sel = f"SELECT t.{_key}, t.name, t.mobile_no FROM phones p JOIN {_table} t ON t.{_key} = p.ref"
+    Q.register(f"{_kind}.by_phone", f"{_sel} WHERE p.kind = {_k} AND p.phone = ? LIMIT ?")
+    Q.register(f"{_kind}.by_phone_suffix", f"{_sel} WHERE p.kind = {_k} AND p.rev >= ? AND p.rev < ? ORDER BY p.rev LIMIT ?")
+
+def find_phone(text, limit=10):
+    """Students and instructors whose mobile number is ``text`` or ends with its digits (4 or more).
+
+    A full Bangladeshi number is one seek on idx_phones_phone; a shorter tail is a prefix
+    range on the reversed digits (idx_phones_rev). Returns {kind: [(key, label)]} like
+    global_search().
+    """
+    key = phone_key(text); hits = {}
+    if key is None: return hits
+    sync_search()
+    full = len(key) == 11 and key.startswith("01")
+    rev = key[::-1]; upper = rev[:-1] + chr(ord(rev[-1]) + 1)
+    for kind in NAME_KINDS:
+        rows = fetch_all(Q(f"{kind}.by_phone"), (key, limit)) if full else \
+               fetch_all(Q(f"{kind}.by_phone_suffix"), (rev, upper, limit))
+        if rows: hits[kind] = [(k, f"{n} · {m}") for k, n, m in rows]
+    return hits
+
+
+# ------------------------- Global search -------------------------
+
+SEARCH_KINDS = ("students", "courses", "instructors", "results")
+
+# full-text candidates are taken in rowid order and only they are ranked, so a one-letter
+# prefix matching half the table costs what a full name does
+Q.register("search.students", """SELECT s.student_id, s.name, s.batch_no
+    FROM (SELECT rowid, rank FROM student_fts WHERE student_fts MATCH ? LIMIT ?) m
+    JOIN Student s ON s.student_id = m.rowid ORDER BY m.rank LIMIT ?""")
+Q.register("search.results", """SELECT r.result_id, s.name, c.course_name, r.grade
+    FROM Result r JOIN Student s ON s.student_id = r.student_id LEFT JOIN Course c ON c.course_id = r.course_id
+    WHERE r.student_id IN (SELECT rowid FROM student_fts WHERE student_fts MATCH ? LIMIT ?) LIMIT ?""")
+
+def global_search(text, limit=5, candidates=200):
+    """Dashboard search over every kind of record: {kind: [(key, label)]}, at most ``limit`` per kind.
+
+    Each kind is one indexed read: students through student_fts, their results through
+    idx_result_student, courses and instructors through their preloaded Lookups. When
+    that finds fewer than ``limit`` students or instructors, fuzzy_names() fills in
+    misspelt names. Kinds without hits are left out; the order is SEARCH_KINDS.
+    """
+    match = fts_query(text); hits = {}
+    if match:
+        hits["students"] = [(k, f"{n} (batch {b})" if b else n)
+                            for k, n, b in fetch_all(Q("search.students"), (match, candidates, limit))]
+    for kind in ("courses", "instructors"):
+        hits[kind] = LOOKUPS[kind].search(text, limit)
+    for kind in ("students", "instructors"):
+        found = hits.get(kind, [])
+        if len(found) < limit:
+            seen = {k for k, _ in found}
+            found += [(k, f"{n} (≈)") for k, n, _ in fuzzy_names(kind, text, limit) if k not in seen][:limit - len(found)]
+            hits[kind] = found
+    if match:
+        hits["results"] = [(k, f"{n} – {c or 'no course'}: {g}")
+                           for k, n, c, g in fetch_all(Q("search.results"), (match, candidates, limit))]
+    return {kind: hits[kind] for kind in SEARCH_KINDS if hits.get(kind)}
+
+
+# ------------------------- Query plans -------------------------
+
+_ALIAS = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|SET\b|LEFT\b|JOIN\b|ORDER\b|VALUES\b)(\w+))?", re.I)
+
+def _aliases(sql):
+    out = {}
+    for table, alias in _ALIAS.findall(sql):
+        out[table] = table
+        if alias: out[alias] = table
+    return out
+
+def explain(conn, sql):
+    """EXPLAIN QUERY PLAN detail lines, with every parameter bound to NULL."""
+    return [r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, (None,) * sql.count("?"))]
+
+_ORDERED_LIMIT = re.compile(r"\bORDER BY (?:(?!\bSELECT\b).)*\bLIMIT \?$")  # of the outermost SELECT
+
+def check_query_plans(conn, threshold=1000, registry=Q):
+    """Return [(name, problem)] for statements that fully scan a table above ``threshold`` rows,
+    indexes of INDEXES the database lacks, and foreign keys whose child column has no index
+    (FK actions scan the child table)."""
+    sizes = {}
+    def size(table):
+        if table not in sizes: sizes[table] = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        return sizes[table]
+    problems = []
+    real = {r[0].lower() for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    if registry is Q:
+        for query in LISTS.values(): query.where_all()  # filter combinations not used yet
+    for name, sql in registry.items():
+        aliases = _aliases(sql)
+        plan = conn.execute("EXPLAIN QUERY PLAN " + sql, (None,) * sql.count("?")).fetchall()
+        # ORDER BY ... LIMIT read in index (or rowid) order stops after LIMIT rows, so its
+        # outer loop may be a SCAN as long as no temp b-tree sorts every row first
+        walk = _ORDERED_LIMIT.search(sql) and not any("TEMP B-TREE FOR ORDER BY" in r[3] for r in plan)
+        outer = next((r[0] for r in plan if r[1] == 0 and re.match(r"(SCAN|SEARCH) ", r[3])), None)
+        for id, _, _, detail in plan:
+            m = re.match(r"SCAN (\w+)", detail)
+            if not m or m.group(1) == "CONSTANT" or name in registry.scan_ok: continue
+            if walk and id == outer: continue
+            if re.search(r"VIRTUAL TABLE INDEX \d+:\S", detail): continue  # a constrained (e.g. MATCH) virtual-table lookup
+            table = aliases.get(m.group(1), m.group(1))
+            if table.lower() not in real: continue  # a materialized subquery
+            if size(table) > threshold: problems.append((name, f"{detail} ({size(table)} rows)"))
+    have = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    problems += [(name, f"index on {ddl} is missing") for name, ddl in INDEXES.items() if name not in have]
+    tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")]
+    for table in tables:
+        indexed = {conn.execute(f'PRAGMA index_info("{ix[1]}")').fetchone()[2]
+                   for ix in conn.execute(f'PRAGMA index_list("{table}")')}
+        for fk in conn.execute(f'PRAGMA foreign_key_list("{table}")'):
+            if fk[3] not in indexed:
+                problems.append((f"{table}.{fk[3]}", f"foreign key to {fk[2]} has no index"))
+    return problems
+
+
+# ------------------------- Module-level helpers -------------------------
+
+_db = None
+
+def open_db(path, **kw):
+    global _db
+    if _db is not None: _db.close()
+    _db = ConnectionManager(path, **kw)
+    return _db
+
+def db():
+    if _db is None: raise RuntimeError("open_db() has not been called")
+    return _db
+
+def check_external_writes():
+    """Multi-instance mode: after another instance (or any other client) has written, drop
+    every cached result and publish key=None events for every table, which resets the
+    Lookups and marks open lists stale. False when it cannot tell (this process is writing
+    right now); the cache must not be trusted then."""
+    m = db()
+    if not m.concurrent: return True
+    changed = m.changed_elsewhere()
+    if changed:
+        with m.reader() as conn:
+            tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")]
+        _publish({t.lower() for t in tables})
+    return changed is not None
+
+class Interrupter:
+    """The reader connections running statements for one owner (a ListView), so cancel()
+    can stop them mid-statement with Connection.interrupt() instead of letting a count or
+    a broad search hold a pooled reader until it finishes.
+
+    fetch_all() calls made inside ``with interrupter.active():`` on a thread register their
+    connection for as long as the statement runs; after cancel() they fail at once.
+    abort() only interrupts the statements running now.
+    """
+    def __init__(self):
+        self._conns = set(); self._lock = threading.Lock(); self.cancelled = False
+
+    @contextmanager
+    def active(self):
+        outer = getattr(_trace_ctx, "reads", None); _trace_ctx.reads = self
+        try:
+            yield self
+        finally:
+            _trace_ctx.reads = outer
+
+    def add(self, conn):
+        with self._lock:
+            if self.cancelled: raise sqlite3.OperationalError("interrupted")
+            self._conns.add(conn)
+
+    def discard(self, conn):
+        with self._lock: self._conns.discard(conn)
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            for conn in self._conns: conn.interrupt()
+
+    def abort(self):
+        with self._lock:
+            for conn in self._conns: conn.interrupt()
+
+def fetch_all(q, p=()):
+    """Read-through cached fetch; see QueryCache. Returns a tuple of rows: the cached
+    result itself, so it must not be changeable by the caller. In multi-instance mode
+    every call first checks for other instances' writes (check_external_writes)."""
+    m = db(); key = (q, tuple(p)) if not isinstance(p, dict) else None
+    if not check_external_writes(): key = None  # read through, and do not cache what may race our own write
+    if key is not None:
+        rows = m.cache.get(key)
+        if rows is not _MISS: return rows
+    tables = tables_read(q); gen = m.cache.generation(tables); reads = getattr(_trace_ctx, "reads", None)
+    with m.reader() as conn:
+        if reads: reads.add(conn)
+        try:
+            rows = m.call(q, lambda: tuple(conn.execute(q, p)))
+        finally:
+            if reads: reads.discard(conn)
+    if key is not None: m.cache.put(key, rows, tables, gen)
+    return rows
+
+def run_query(q, p=()):
+    """Run one write statement and publish its change events; returns the new row's key after an INSERT.
+
+    A write whose triggers queue search_pending rows commits together with their sync.
+    Inside transaction() the statement joins it, and its events wait for the commit.
+    """
+    m = db(); writes = writes_of(q); written = {t for t, _ in writes}
+    with m.writer() as conn:
+        if m._tx is not None: return m._tx.execute(q, p).lastrowid
+        queued = SEARCH_QUEUE in m.write_effects(conn, writes) and not conn.in_transaction; synced = set()
+        try:
+            if queued: m.call("BEGIN IMMEDIATE", lambda: conn.execute("BEGIN IMMEDIATE"))
+            rowid = m.call(q, lambda: conn.execute(q, p)).lastrowid
+            if queued:
+                synced = _sync_search(conn); m.call("COMMIT", lambda: conn.execute("COMMIT"))
+        except BaseException:
+            if queued and conn.in_transaction: conn.execute("ROLLBACK")
+            raise
+        finally:
+            effects = m.write_effects(conn, writes) | synced; m.cache.invalidate(effects)
+        key = m.changed_key(conn, q, p, rowid)
+    _publish(effects, written, key)
+    return rowid
+
+def run_many(q, seq):
+    """Run one statement for every parameter tuple in a single transaction."""
+    with transaction() as tx:
+        return tx.executemany(q, seq).rowcount
+
+def iter_batches(q, p=(), batch=500):
+    """Yield lists of up to ``batch`` rows, holding one reader connection until exhausted or closed."""
+    m = db(); spent = 0.0; n = 0
+    try:
+        with m.reader() as conn:
+            t = time.perf_counter()
+            with closing(m.call(q, lambda: conn.execute(q, p), trace=False)) as cur:
+                while True:
+                    rows = cur.fetchmany(batch); spent += time.perf_counter() - t
+                    if not rows: return
+                    n += len(rows); yield rows
+                    t = time.perf_counter()
+    finally:
+        m.tracer.record(q, spent, n)
+
+def iter_rows(q, p=(), batch=500):
+    """Stream rows one by one; only ``batch`` rows are ever held in memory."""
+    for rows in iter_batches(q, p, batch):
+        yield from rows
+
+def export_csv(path, q, p=(), header=None, batch=1000):
+    """Write the rows of q to a CSV file without materializing the result; returns the row count."""
+    n = 0
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        w = csv.writer(fh)
+        if header: w.writerow(header)
+        for rows in iter_batches(q, p, batch):
+            w.writerows(rows); n += len(rows)
+    return n
+
+
+# ------------------------- Transactions -------------------------
+
+class Transaction:
+    """Handle yielded by transaction(); remembers its writes for cache invalidation."""
+    def __init__(self, manager, conn):
+        self.manager = manager; self.conn = conn; self.writes = set(); self._savepoints = 0
+
+    def execute(self, q, p=()):
+        self.writes |= writes_of(q)
+        return self.manager.call(q, lambda: self.conn.execute(q, p))
+
+    def executemany(self, q, seq):
+        self.writes |= writes_of(q)
+        return self.manager.call(q, lambda: self.conn.executemany(q, seq))
+
+    @contextmanager
+    def savepoint(self):
+        """Roll back only the statements inside the block if it raises (the error still propagates)."""
+        self._savepoints += 1; name = f"sp_{self._savepoints}"
+        self.conn.execute(f"SAVEPOINT {name}")
+        try:
+            yield self
+        except BaseException:
+            self.conn.execute(f"ROLLBACK TO {name}"); self.conn.execute(f"RELEASE {name}")
+            raise
+        self.conn.execute(f"RELEASE {name}")
+
+
+@contextmanager
+def transaction():
+    """Group writes into one commit on the writer connection.
+
+    Nested use on the same thread becomes a savepoint of the outer transaction.
+    """
+    m = db()
+    with m.writer() as conn:
+        outer = m._tx
+        if outer is not None:
+            with outer.savepoint(): yield outer
+            return
+        tx = m._tx = Transaction(m, conn); committed = False; synced = set()
+        try:
+            m.call("BEGIN IMMEDIATE", lambda: conn.execute("BEGIN IMMEDIATE"))
+            yield tx
+            if SEARCH_QUEUE in m.write_effects(conn, tx.writes): synced = _sync_search(conn)
+            m.call("COMMIT", lambda: conn.execute("COMMIT")); committed = True
+        except BaseException:
+            if conn.in_transaction: conn.execute("ROLLBACK")
+            raise
+        finally:
+            m._tx = None
+            effects = m.write_effects(conn, tx.writes) | synced; m.cache.invalidate(effects)
+    if committed: _publish(effects)
+
+
+class UnitOfWork:
+    """Collects inserts, updates and deletes and commits them in one transaction.
+
+    Consecutive operations with the same SQL are sent as a single executemany.
+
+        with UnitOfWork() as uow:
+            for sid, grade in grades: uow.add(Q("results.insert"), (sid, cid, grade, iid))
+    """
+    def __init__(self):
+        self._ops = []
+
+    def add(self, q, p=()):
+        self._ops.append((q, p)); return self
+
+    def __len__(self):
+        return len(self._ops)
+
+    def commit(self):
+        ops, self._ops = self._ops, []
+        with transaction() as tx:
+            for q, group in itertools.groupby(ops, key=lambda op: op[0]):
+                params = [p for _, p in group]
+                if len(params) == 1: tx.execute(q, params[0])
+                else: tx.executemany(q, params)
+        return len(ops)
+
+    def rollback(self):
+        self._ops.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None: self.commit()
+        else: self.rollback()
+
+
+# ------------------------- Background executor -------------------------
+
+class DBExecutor:
+    """Runs database calls on worker threads and hands back futures."""
+    def __init__(self, workers=2):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="nvit-db")
+
+    def submit(self, fn, *args, **kw):
+        return self._pool.submit(fn, *args, **kw)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+class TkDispatcher:
+    """Submits work to a DBExecutor and delivers results on the Tk thread.
+
+    Worker threads never touch Tk: finished futures are queued and drained by an
+    ``after()`` poll that only runs while something is pending.
+    """
+    def __init__(self, root, executor, poll_ms=15):
+        self.root = root; self.executor = executor; self.poll_ms = poll_ms
+        self._done = queue.SimpleQueue(); self._pending = 0; self._polling = False
+        self._events = queue.SimpleQueue()
+
+    def submit(self, fn, *args, on_done=None, on_error=None, owner=None):
+        fut = self.executor.submit(with_caller, caller_label(), fn, *args)
+        self._pending += 1
+        fut.add_done_callback(lambda f: self._done.put((f, on_done, on_error, owner)))
+        self._schedule()
+        return fut
+
+    def subscribe(self, table, fn, owner=None):
+        """Call fn(table, key) on the Tk thread for every change event on ``table``
+        (see EventBus) until ``owner`` is destroyed; returns an unsubscribe function."""
+        def handler(t, key):
+            self._events.put((fn, owner, unsubscribe, t, key))
+            if threading.current_thread() is threading.main_thread(): self._schedule()
+        unsubscribe = events.subscribe(table, handler)
+        return unsubscribe
+
+    def _schedule(self):
+        if not self._polling:
+            self._polling = True; self.root.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        while True:  # change events first, so on_done callbacks see pickers already updated
+            try: fn, owner, unsubscribe, table, key = self._events.get_nowait()
+            except queue.Empty: break
+            if owner is not None and not owner.winfo_exists(): unsubscribe(); continue
+            try: fn(table, key)
+            except Exception: self.root.report_callback_exception(*sys.exc_info())
+        while True:
+            try: fut, on_done, on_error, owner = self._done.get_nowait()
+            except queue.Empty: break
+            self._pending -= 1
+            if fut.cancelled() or (owner is not None and not owner.winfo_exists()): continue
+            try:
+                exc = fut.exception()
+                if exc is None:
+                    if on_done: on_done(fut.result())
+                elif on_error: on_error(exc)
+                else: raise exc
+            except Exception:
+                self.root.report_callback_exception(*sys.exc_info())
+        if self._pending or not self._events.empty(): self.root.after(self.poll_ms, self._poll)
+        else: self._polling = False
+
+
+# ------------------------- Command line -------------------------
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(prog="nvit_db", description="NVIT database maintenance")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    cp = sub.add_parser("check-plans", help="EXPLAIN QUERY PLAN every registered statement")
+    cp.add_argument("db", nargs="?", default="nvit_system.db")
+    cp.add_argument("--threshold", type=int, default=1000, help="row count above which a full SCAN fails")
+    sp = sub.add_parser("slow-summary", help="p50/p95/p99 per statement of the calls in a slow-query log")
+    sp.add_argument("log", nargs="?", default="nvit_slow.log")
+    args = ap.parse_args(argv)
+    if args.cmd == "slow-summary":
+        print(f"slow tail only: calls that took slow_ms or longer, from {args.log}")
+        print(format_summary(slow_log_summary(args.log))); return 0
+    if args.cmd == "check-plans":
+        manager = open_db(args.db)
+        try:
+            with manager.writer() as conn:
+                migrate(conn); problems = check_query_plans(conn, args.threshold)
+        finally:
+            manager.close()
+        for name, problem in problems: print(f"FAIL {name}: {problem}")
+        print(f"{len(Q)} statements checked, {len(problems)} problem(s)")
+        return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,626 @@
+# nvit_widgets.py
+# Reusable Tk widgets for the NVIT management system.
+import tkinter as tk
+from tkinter import ttk
+from collections import OrderedDict
+
+
+# ------------------------- Virtual list -------------------------
+
+PAGE_SIZES = (25, 50, 100, 250, 500)
+
+class VirtualTree(ttk.Frame):
+    """Paged Treeview that only materializes the rows in view.
+
+    Each page is one ListView block, read with a keyset seek on the background
+    dispatcher, so next/previous cost the same on page 500 as on page 1; the next
+    page is prefetched and at most ``keep_blocks`` pages stay in memory. Within a
+    page the Treeview holds only ``height`` rows and scrolls virtually. Item ids are
+    the rows' primary keys, so the selection survives scrolling. Fires <<ListSelect>>
+    when the user selects a row. After a write, added/changed/removed patch the one
+    row instead of reloading; refresh() rereads everything. Clicking a sortable header
+    re-queries in that order (ListQuery.sorts), still one keyset seek per page.
+    Right-clicking a filterable header (marked ▿, ▾ while filtered) lists the column's
+    values with their counts in a ColumnFilter; the ticked values become part of
+    every page query (ListQuery.filters).
+
+    Every read runs off the Tk thread; a progress bar and row counter in the pager
+    show what is in flight. The current page is read alongside the row count rather
+    than after it, and destroying the widget cancels any key walk still running.
+    While it is hidden (a withdrawn WindowPool window or another LazyNotebook tab)
+    change events on the list's tables only mark it stale; it rereads the current
+    page when it is shown again. A shown list refreshes on key=None events, i.e.
+    rows changed that its own window did not write (a cascade, another instance).
+    """
+    def __init__(self, parent, columns, view, dispatcher, height=12, width=None, page_size=100, keep_blocks=20):
+        super().__init__(parent)
+        self.view = view; self.dispatcher = dispatcher; self.height = height; self.keep_blocks = keep_blocks
+        self.shown = len(columns)  # rows may carry hidden columns after the displayed ones
+        view.block = page_size; view.reset()
+        self.pager = ttk.Frame(self); self.pager.pack(side='bottom', fill='x', pady=(4, 0))
+        self.tree = ttk.Treeview(self, columns=columns, show='headings', height=height, selectmode='browse')
+        self.headings = list(columns); q = view.query
+        for i, c in enumerate(columns):
+            text = c + (" ▿" if q.columns[i] in q.filters else "")
+            if i == 0 or q.columns[i] in q.sorts: self.tree.heading(c, text=text, command=lambda i=i: self.sort_by(i))
+            else: self.tree.heading(c, text=text)
+            if width: self.tree.column(c, anchor='center', width=width)
+            else: self.tree.column(c, anchor='center')
+        self.bar = ttk.Scrollbar(self, orient='vertical', command=self._on_scrollbar)
+        self.tree.pack(side='left', fill='both', expand=True); self.bar.pack(side='right', fill='y')
+        self._build_pager()
+        self.total = 0; self.top = 0; self.page = 0; self._gen = 0; self._epoch = 0
+        self._counting = False; self._busy = 0; self._ticking = None
+        self._blocks = OrderedDict(); self._loading = set()
+        self._rows = {}; self._selected = None; self._selected_row = None; self._focus_edge = None
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+        self.tree.bind("<Button-3>", self._on_heading_menu)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1, 'units'))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-1, 'units'))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(1, 'units'))
+        self.tree.bind("<Up>", lambda e: self._step(-1))
+        self.tree.bind("<Down>", lambda e: self._step(1))
+        self.tree.bind("<Prior>", lambda e: self.scroll(-1, 'pages'))
+        self.tree.bind("<Next>", lambda e: self.scroll(1, 'pages'))
+        self.bind("<Destroy>", self._on_destroy)
+        self._stale = False; self._refresh_job = None
+        for t in view.query.tables: dispatcher.subscribe(t, self._on_change, owner=self)
+        self.winfo_toplevel().bind("<Map>", self._on_map, add="+")
+        self.winfo_toplevel().bind("<Unmap>", self._on_unmap, add="+")
+
+    def _build_pager(self):
+        p = self.pager
+        self.first_btn = ttk.Button(p, text="|◀", width=3, command=lambda: self.go(0))
+        self.prev_btn = ttk.Button(p, text="◀ Prev", command=lambda: self.go(self.page - 1))
+        self.page_var = tk.StringVar(value="1"); self.pages_lbl = ttk.Label(p, text="of 1")
+        page_e = ttk.Entry(p, textvariable=self.page_var, width=6, justify='center')
+        page_e.bind("<Return>", self._on_jump)
+        self.next_btn = ttk.Button(p, text="Next ▶", command=lambda: self.go(self.page + 1))
+        self.last_btn = ttk.Button(p, text="▶|", width=3, command=lambda: self.go(self.pages() - 1))
+        self.first_btn.pack(side='left'); self.prev_btn.pack(side='left', padx=(2, 6))
+        ttk.Label(p, text="Page").pack(side='left'); page_e.pack(side='left', padx=4); self.pages_lbl.pack(side='left')
+        self.next_btn.pack(side='left', padx=(6, 2)); self.last_btn.pack(side='left')
+        self.size_var = tk.StringVar(value=str(self.view.block))
+        size_cb = ttk.Combobox(p, textvariable=self.size_var, values=PAGE_SIZES, width=5, state='readonly')
+        size_cb.bind("<<ComboboxSelected>>", lambda e: self.set_page_size(int(self.size_var.get())))
+        size_cb.pack(side='right'); ttk.Label(p, text="Rows/page:").pack(side='right', padx=4)
+        self.range_lbl = ttk.Label(p, text=""); self.range_lbl.pack(side='right', padx=12)
+        self.progress = ttk.Progressbar(p, length=90, mode='determinate'); self.progress.pack(side='right')
+
+    # ---- background reads
+    def _submit(self, fn, *args, on_done):
+        """dispatcher.submit that keeps the progress bar going while the call is in flight.
+
+        A read that fails after a newer generation started (e.g. one interrupted when the
+        window was hidden) is dropped like its result would be.
+        """
+        self._busy += 1; gen = self._gen
+        if not self._ticking: self._tick()
+        def done(result):
+            self._busy -= 1; on_done(result)
+        def failed(exc):
+            self._busy -= 1
+            if gen == self._gen: raise exc
+        return self.dispatcher.submit(fn, *args, on_done=done, on_error=failed, owner=self)
+
+    def _tick(self):
+        """Show how far a jump has walked towards a far page, a spinner for other reads."""
+        if not self._busy:
+            self._ticking = None; self.progress.stop(); self.progress.config(mode='determinate', value=0); return
+        known = self.view.known()
+        if self.page > known + 1:
+            self.progress.stop(); self.progress.config(mode='determinate', value=100 * known / self.page)
+        elif str(self.progress.cget('mode')) != 'indeterminate':
+            self.progress.config(mode='indeterminate'); self.progress.start(15)
+        self._ticking = self.after(100, self._tick)
+
+    def _on_change(self, table, key):
+        if not self.winfo_viewable(): self._stale = True
+        elif key is None and not self._refresh_job:  # one refresh for a burst of events
+            self._refresh_job = self.after_idle(self._refresh_changed)
+
+    def _refresh_changed(self):
+        """After key=None events (foreign-key actions, another instance's commit) reread the
+        count and the shown page, and reload only if either differs."""
+        self._refresh_job = None
+        shown = self._blocks.get(self.page)
+        if shown is None or self._counting: return self.refresh()
+        self._gen += 1; gen = self._gen; page = self.page; view = self.view
+        self._loading.clear(); view.reset()
+        def reread():
+            n = view.count(); return n, view.rows(page, n)
+        self._submit(reread, on_done=lambda fresh: self._recheck(gen, page, shown, *fresh))
+
+    def _recheck(self, gen, page, shown, n, rows):
+        if gen != self._gen: return
+        if n != self.total or list(rows) != shown: return self.refresh()
+        self._blocks.clear(); self._blocks[page] = shown  # other pages may have moved; read again on demand
+        self.render()
+
+    def _on_map(self, e):
+        if self._stale and self.winfo_viewable():
+            self._stale = False; self.refresh()
+
+    def _on_unmap(self, e):
+        # a pooled window is withdrawn, not destroyed: stop its reads like closing used to
+        if self._busy and not self.winfo_viewable():
+            self._gen += 1; self.view.abort(); self._stale = True  # reread what was cut short once shown
+
+    def _on_destroy(self, e):
+        if e.widget is not self: return
+        self._gen += 1; self.view.cancel()
+        if self._ticking: self.after_cancel(self._ticking); self._ticking = None
+        if self._refresh_job: self.after_cancel(self._refresh_job); self._refresh_job = None
+
+    # ---- data
+    def refresh(self):
+        """Drop cached blocks, recount and redraw from the DB. The selection stays while its
+        row is still in the list, so a form filled from it can still be saved."""
+        self._gen += 1; gen = self._gen
+        self._blocks.clear(); self._loading.clear(); self.view.reset(); self._counting = True
+        self._submit(self.view.count, on_done=lambda n: self._counted(gen, n))
+        if self._selected_row is not None:
+            key = self._selected_row[0]
+            self._submit(self.view.row, key, on_done=lambda row: self._reselected(gen, key, row))
+        self.render()  # reads the current page now; the count only sizes the pager
+
+    def _reselected(self, gen, key, row):
+        if gen != self._gen or self._selected != str(key): return
+        if row is None: self._selected = self._selected_row = None
+        else: self._selected_row = row
+        self.render()
+
+    def reveal(self, key):
+        """Page to the row with ``key`` and select it, firing <<ListSelect>>; nothing if it is not listed."""
+        if self._stale: self._stale = False; self.refresh()  # catch up now, not on the coming <Map>
+        gen = self._gen
+        self._submit(self.view.locate, key, on_done=lambda hit: hit and self._reveal(gen, key, *hit))
+
+    def _reveal(self, gen, key, index, row):
+        if gen != self._gen: return
+        self.total = max(self.total, index + 1)  # the count may still be on its way
+        self.page = index // self.view.block; self.top = index; self._clamp()
+        self._selected = str(key); self._selected_row = row
+        self.render(); self.event_generate("<<ListSelect>>")
+
+    def _counted(self, gen, n):
+        if gen != self._gen: return
+        self.total = n; self._counting = False; self._clamp(); self.render()
+
+    # ---- paging
+    def pages(self):
+        return max(1, -(-self.total // self.view.block))
+
+    def _bounds(self):
+        lo = self.page * self.view.block
+        return lo, min(self.total, lo + self.view.block)
+
+    def _clamp(self):
+        self.page = max(0, min(self.page, self.pages() - 1)); lo, hi = self._bounds()
+        self.top = max(lo, min(self.top, hi - self.height))
+
+    def go(self, page):
+        """Show ``page`` (0-based); a jump walks index keys only, never OFFSET."""
+        page = max(0, min(page, self.pages() - 1))
+        if page != self.page:
+            self.page = page; self.top = page * self.view.block; self.render()
+        else: self._update_pager()
+
+    def _on_jump(self, e=None):
+        try: self.go(int(self.page_var.get()) - 1)
+        except ValueError: self._update_pager()
+
+    def set_page_size(self, n):
+        if n == self.view.block: return
+        first = self.top; self.view.block = n; self.view.reset()
+        self._blocks.clear(); self._loading.clear(); self._epoch += 1
+        self.page = first // n; self.top = first; self._clamp(); self.render()
+
+    def _block(self, b):
+        if b in self._blocks:
+            self._blocks.move_to_end(b); return self._blocks[b]
+        if b not in self._loading and (self._counting or b * self.view.block < self.total):
+            self._loading.add(b); token = (self._gen, self._epoch)
+            total = None if self._counting else self.total
+            self._submit(self.view.rows, b, total, on_done=lambda rows: self._loaded(token, b, rows))
+        return None
+
+    def _loaded(self, token, b, rows):
+        if token != (self._gen, self._epoch): return
+        self._loading.discard(b); self._blocks[b] = list(rows)  # patched in place; never alias the query cache
+        if self._counting: self.total = max(self.total, b * self.view.block + len(rows))
+        while len(self._blocks) > self.keep_blocks: self._blocks.popitem(last=False)
+        self.render()
+
+    # ---- sorting
+    def sort_by(self, i):
+        """Header click: sort by column ``i`` on the server, toggling the direction on a second click."""
+        col = self.view.query.columns[i] if i else None
+        desc = not self.view.desc if col == self.view.sort_col else False
+        self.view.sort(col, desc); self._gen += 1; gen = self._gen
+        self._blocks.clear(); self._loading.clear(); self.page = 0; self.top = 0
+        if self._counting: self._submit(self.view.count, on_done=lambda n: self._counted(gen, n))
+        self._arrows(); self.render()
+
+    def search(self, text):
+        """Show only full-text matches for ``text``, best first (ListView.search); '' shows every row."""
+        if not self.view.search(text): return
+        self.page = 0; self.top = 0; self._arrows(); self.refresh()
+
+    def _arrows(self):
+        q = self.view.query; cols = q.columns; sort_col = self.view.sort_col
+        for j, c in enumerate(self.headings):
+            on = cols[j] == sort_col if j else sort_col is None
+            mark = " ▾" if cols[j] in self.view.filters else " ▿" if cols[j] in q.filters else ""
+            self.tree.heading(c, text=c + ((" ▼" if self.view.desc else " ▲") if on else "") + mark)
+
+    # ---- filtering
+    def filter(self, col, values=None):
+        """Show only rows whose ``col`` is one of ``values`` (ListView.filter); None drops that filter."""
+        if not self.view.filter(col, values): return
+        self.page = 0; self.top = 0; self._arrows(); self.refresh()
+
+    def clear_filters(self):
+        """Drop every column filter, e.g. before revealing a row they might hide."""
+        if not self.view.filters: return
+        for col in list(self.view.filters): self.view.filter(col, None)
+        self.page = 0; self.top = 0; self._arrows(); self.refresh()
+
+    def _on_heading_menu(self, e):
+        if self.tree.identify_region(e.x, e.y) != 'heading': return
+        col = self.view.query.columns[int(self.tree.identify_column(e.x)[1:]) - 1]
+        if col not in self.view.query.filters: return
+        x, y = e.x_root, e.y_root
+        self._submit(self.view.distinct, col, on_done=lambda values: ColumnFilter(
+            self, values, self.view.filters.get(col), lambda picked: self.filter(col, picked), x, y))
+
+    # ---- patching
+    def added(self, key):
+        """A row was inserted: read it by key and slot it in."""
+        if self.view.ranked: return self._lost(None)
+        gen = self._gen
+        self._submit(self.view.row, key, on_done=lambda row: row and gen == self._gen and
+                     self._shift(self.view.pos(row), key, row))
+
+    def changed(self, key):
+        """A row was updated: read it by key and replace it, moving it if its sort value changed."""
+        if self.view.ranked: return self._lost(None)
+        gen = self._gen
+        self._submit(self.view.row, key, on_done=lambda row: self._replace(gen, key, row))
+
+    def removed(self, key):
+        """A row was deleted: drop it and close the gap."""
+        if self.view.ranked: return self._lost(None)
+        self._drop(self._gen, key)
+
+    def _cached(self, key):
+        iid = str(key)
+        if iid in self._rows: return self._rows[iid]
+        if self._selected == iid: return self._selected_row
+        for block in self._blocks.values():
+            for r in block:
+                if r[0] == key: return r
+        return None
+
+    def _drop(self, gen, key):
+        if gen != self._gen: return
+        old = self._cached(key)
+        if old is not None: self._shift(self.view.pos(old), key, None)
+        elif self.view.narrowed: self._lost(None)  # it may not have matched the search or filters at all
+        elif self.view.sort_col: self._lost(-1)  # its place in this order is unknown
+        else: self._shift(key, key, None)
+
+    def _replace(self, gen, key, row):
+        if gen != self._gen: return
+        if row is None: return self._drop(gen, key)
+        old = self._cached(key); pos = self.view.pos(row)
+        if old is None:
+            if self.view.narrowed: self._lost(None)  # it may have started matching the search or filters
+            elif self.view.sort_col: self._lost(0)  # it may have moved into the cached pages
+            return
+        if self.view.pos(old) != pos:
+            self._shift(self.view.pos(old), key, None); return self._shift(pos, key, row)
+        block = self._blocks.get(self.view.block_of(pos))
+        if block:
+            i = self.view.index(block, pos)
+            if i < len(block) and block[i][0] == key: block[i] = row
+        iid = str(key)
+        if self.tree.exists(iid): self.tree.item(iid, values=row[:self.shown]); self._rows[iid] = row
+        if self._selected == iid: self._selected_row = row
+
+    def _lost(self, delta):
+        """A row changed outside the cached pages: adjust the count (recount for None), reread the pages."""
+        if delta is None:
+            gen = self._gen; self._counting = True
+            self._submit(self.view.count, on_done=lambda n: self._counted(gen, n))
+        else: self.total += delta
+        self.view.reset(); self._blocks.clear(); self._loading.clear(); self._epoch += 1
+        self._clamp(); self.render()
+
+    def _shift(self, pos, key, row):
+        """Insert ``row`` (or remove the row at ``pos`` when row is None) in the cached blocks.
+
+        Only the block holding the position and the cached blocks after it move by one
+        row; anything that can no longer be trusted is dropped and re-read on demand.
+        """
+        B = self.view.block; b = self.view.block_of(pos); blocks = self._blocks
+        self.view.forget(b); self._epoch += 1; self._loading.clear()
+        block = blocks.get(b)
+        if block is None:
+            for k in [k for k in blocks if k >= b]: del blocks[k]
+        else:
+            i = self.view.index(block, pos)
+            hit = i < len(block) and block[i][0] == key
+            if row is None and not hit: return
+            if row is not None:
+                if hit: block[i] = row; return self.render()
+                block.insert(i, row)
+            else: del block[i]
+            while True:  # carry the overflow / borrow the gap through the following cached blocks
+                nxt = blocks.get(b + 1)
+                if row is not None and len(block) > B:
+                    last = block.pop()
+                    if nxt is not None: nxt.insert(0, last)
+                elif row is None and len(block) < B and nxt:
+                    block.append(nxt.pop(0))
+                self.view.seen(b, block)
+                if nxt is None: break
+                b += 1; block = nxt
+            if row is None and len(block) < B and (b + 1) * B < self.total: del blocks[b]
+            for k in [k for k in blocks if k > b]: del blocks[k]
+        self.total += 1 if row is not None else -1
+        if row is None and self._selected == str(key): self._selected = self._selected_row = None
+        self._clamp(); self.render()
+
+    # ---- drawing
+    def render(self):
+        lo, hi = self._bounds(); end = min(hi, self.top + self.height)
+        block = self._block(self.page)
+        rows = [block[p - lo] if block is not None and p - lo < len(block) else None for p in range(self.top, end)]
+        if block is not None: self._block(self.page + 1)  # prefetch the next page once its anchor is known
+        self.tree.delete(*self.tree.get_children()); self._rows = {}
+        for r in rows:
+            if r is None:
+                self.tree.insert("", "end", values=("…",))
+            elif not self.tree.exists(str(r[0])):
+                self.tree.insert("", "end", iid=str(r[0]), values=r[:self.shown]); self._rows[str(r[0])] = r
+        if self._selected in self._rows:
+            self.tree.selection_set(self._selected); self.tree.focus(self._selected)
+        if self._focus_edge and None not in rows and rows:
+            iid = str(rows[0][0] if self._focus_edge < 0 else rows[-1][0])
+            self._focus_edge = None; self.tree.selection_set(iid); self.tree.focus(iid)
+        if hi > lo: self.bar.set((self.top - lo) / (hi - lo), (end - lo) / (hi - lo))
+        else: self.bar.set(0, 1)
+        self._update_pager()
+
+    def _update_pager(self):
+        lo, hi = self._bounds(); n = self.pages()
+        more = "+" if self._counting else ""
+        self.page_var.set(str(self.page + 1)); self.pages_lbl.config(text=f"of {n:,}{more}")
+        self.range_lbl.config(text=f"{lo + 1 if hi else 0:,}–{hi:,} of {self.total:,}{more}")
+        for btn, ok in ((self.first_btn, self.page > 0), (self.prev_btn, self.page > 0),
+                        (self.next_btn, self.page < n - 1), (self.last_btn, self.page < n - 1)):
+            btn.state(['!disabled'] if ok else ['disabled'])
+
+    def scroll(self, n, what='units'):
+        step = n * (self.height if what == 'pages' else 1); lo, hi = self._bounds()
+        top = max(lo, min(self.top + step, hi - self.height))
+        if top != self.top:
+            self.top = top; self.render()
+        return "break"
+
+    def _on_scrollbar(self, *args):
+        if args[0] == 'moveto':
+            lo, hi = self._bounds()
+            top = max(lo, min(lo + int(float(args[1]) * (hi - lo)), hi - self.height))
+            if top != self.top:
+                self.top = top; self.render()
+        elif args[0] == 'scroll':
+            self.scroll(int(args[1]), args[2])
+
+    def _step(self, d):
+        """Arrow keys on the first/last visible row scroll the page instead of stopping."""
+        items = self.tree.get_children(); focus = self.tree.focus()
+        if not items or focus != items[-1 if d > 0 else 0]: return None
+        lo, hi = self._bounds()
+        if lo <= self.top + d <= hi - self.height:
+            self._focus_edge = d; self.scroll(d, 'units')
+        return "break"
+
+    # ---- selection
+    def _on_tree_select(self, e=None):
+        sel = self.tree.selection()
+        if not sel or sel[0] not in self._rows or sel[0] == self._selected: return
+        self._selected = sel[0]; self._selected_row = self._rows[sel[0]]
+        self.event_generate("<<ListSelect>>")
+
+    def selected_key(self):
+        return self._selected_row[0] if self._selected_row else None
+
+    def selected(self):
+        """Values of the selected row (None when nothing is selected), even if scrolled out of view."""
+        return self._selected_row
+
+
+# ------------------------- Column filter -------------------------
+
+class ColumnFilter(tk.Toplevel):
+    """Excel-style value list for one column: tick the values to show and press OK.
+
+    ``values`` are ListView.distinct() rows (value, label, count) and ``chosen`` the
+    values shown now (None: all of them). command() gets the ticked values, or None
+    when every value is ticked, i.e. no filter.
+    """
+    def __init__(self, parent, values, chosen, command, x, y):
+        super().__init__(parent)
+        self.transient(parent.winfo_toplevel()); self.title("Filter"); self.geometry(f"+{x}+{y}")
+        self.values = [v for v, _, _ in values]; self.command = command
+        frm = ttk.Frame(self, padding=6); frm.pack(fill='both', expand=True)
+        box = self.box = tk.Listbox(frm, selectmode='multiple', exportselection=False, width=32,
+                                    height=min(15, max(3, len(values))))
+        bar = ttk.Scrollbar(frm, orient='vertical', command=box.yview); box.config(yscrollcommand=bar.set)
+        for j, (v, label, n) in enumerate(values):
+            box.insert('end', f"{label} ({n})")
+            if chosen is None or v in chosen: box.selection_set(j)
+        btns = ttk.Frame(frm); btns.pack(side='bottom', fill='x', pady=(6, 0))
+        box.pack(side='left', fill='both', expand=True); bar.pack(side='right', fill='y')
+        ttk.Button(btns, text="All", width=5, command=lambda: box.selection_set(0, 'end')).pack(side='left')
+        ttk.Button(btns, text="None", width=5, command=lambda: box.selection_clear(0, 'end')).pack(side='left', padx=4)
+        ttk.Button(btns, text="Cancel", command=self.destroy).pack(side='right')
+        ttk.Button(btns, text="OK", command=self._ok).pack(side='right', padx=4)
+        self.bind("<Return>", lambda e: self._ok()); self.bind("<Escape>", lambda e: self.destroy())
+        box.focus_set()
+
+    def _ok(self):
+        picked = self.box.curselection()
+        if not picked: return self.bell()  # an empty list is never what was meant
+        self.command(None if len(picked) == len(self.values) else [self.values[j] for j in picked])
+        self.destroy()
+
+
+# ------------------------- Type-ahead picker -------------------------
+
+class Picker(ttk.Combobox):
+    """Combobox that suggests up to ``limit`` matches from a Lookup as the user types.
+
+    Lookups are debounced by ``delay`` ms and run on the background dispatcher, so the
+    picker opens instantly however large the table is. get_id() returns the id of the
+    picked suggestion (None until one is picked); set_id() shows a known row. Change
+    events on the lookup's table refresh the suggestions and the shown row, so a
+    course added or renamed in another window shows up without reopening this one.
+    """
+    NAV_KEYS = {"Up", "Down", "Return", "KP_Enter", "Tab", "Escape", "Left", "Right", "Home", "End",
+                "Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R"}
+
+    def __init__(self, parent, lookup, dispatcher, limit=20, delay=250, **kw):
+        super().__init__(parent, **kw)
+        self.lookup = lookup; self.dispatcher = dispatcher; self.limit = limit; self.delay = delay
+        self._ids = []; self._id = None; self._after = None; self._seq = 0
+        self.bind("<KeyRelease>", self._on_key)
+        self.bind("<<ComboboxSelected>>", self._on_pick)
+        self.bind("<FocusIn>", lambda e: self['values'] or self._search())
+        self.bind("<Destroy>", lambda e: self._after and self.after_cancel(self._after))
+        dispatcher.subscribe(lookup.table, self._on_change, owner=self)
+
+    def _on_key(self, e):
+        if e.keysym in self.NAV_KEYS: return
+        self._id = None
+        if self._after: self.after_cancel(self._after)
+        self._after = self.after(self.delay, self._search)
+
+    def _search(self):
+        self._after = None; self._seq += 1; seq = self._seq
+        self.dispatcher.submit(self.lookup.search, self.get(), self.limit,
+                               on_done=lambda rows: self._found(seq, rows), owner=self)
+
+    def _found(self, seq, rows):
+        if seq != self._seq: return  # a newer keystroke's lookup is on its way
+        self._ids = [r[0] for r in rows]; self['values'] = [self.lookup.label(*r) for r in rows]
+
+    def _on_pick(self, e=None):
+        i = self.current(); self._id = self._ids[i] if 0 <= i < len(self._ids) else None
+
+    def get_id(self):
+        if self._id is None: self._id = self.lookup.id_of(self.get().strip())  # a label typed out in full
+        return self._id
+
+    def set_id(self, id, name=None):
+        self._id = id; self.set(self.lookup.label(id, name) if id is not None else '')
+        if id is not None and name is not None: self.lookup.remember(id, name)
+
+    def _on_change(self, table, key):
+        self._ids = []; self['values'] = ()  # suggestions may be stale; search again on next use
+        if self.tk.call('focus') == str(self): self._search()
+        if self._id is not None and key in (None, self._id):
+            shown = self._id
+            self.dispatcher.submit(self.lookup.name_of, shown, owner=self,
+                                   on_done=lambda name: self._id == shown and self.set_id(shown if name else None, name))
+
+    def clear(self):
+        self.set_id(None)
+
+
+# ------------------------- Search box -------------------------
+
+class SearchBox(ttk.Entry):
+    """Entry that calls command(text) ``delay`` ms after the user stops typing; Escape clears it."""
+    def __init__(self, parent, command, delay=250, **kw):
+        super().__init__(parent, **kw)
+        self.command = command; self.delay = delay; self._after = None
+        self.bind("<KeyRelease>", self._on_key)
+        self.bind("<Escape>", lambda e: (self.delete(0, tk.END), self._fire()))
+        self.bind("<Return>", lambda e: self._fire())
+        self.bind("<Destroy>", lambda e: self._after and self.after_cancel(self._after))
+
+    def _on_key(self, e):
+        if e.keysym in Picker.NAV_KEYS: return
+        if self._after: self.after_cancel(self._after)
+        self._after = self.after(self.delay, self._fire)
+
+    def _fire(self):
+        if self._after: self.after_cancel(self._after); self._after = None
+        self.command(self.get())
+
+
+# ------------------------- Window pool -------------------------
+
+class WindowPool:
+    """Keeps one Toplevel per kind: closing it withdraws it, showing it again deiconifies it.
+
+    build() must create and return the Toplevel; it runs only the first time, or again
+    if the window was really destroyed.
+    """
+    def __init__(self):
+        self._windows = {}
+
+    def show(self, kind, build):
+        win = self._windows.get(kind)
+        if win is None or not win.winfo_exists():
+            win = self._windows[kind] = build()
+            win.protocol("WM_DELETE_WINDOW", win.withdraw)
+        else:
+            win.deiconify()
+        win.lift(); win.focus_set()
+        return win
+
+
+# ------------------------- Lazy notebook -------------------------
+
+class LazyNotebook(ttk.Notebook):
+    """Notebook whose tabs are built on first activation.
+
+    add_lazy() adds an empty frame; build(frame) fills it the first time the tab is
+    selected. After every build, prefetch() of the next unbuilt tab (in the order the
+    tabs were added, most used first) runs on the dispatcher so its first load is
+    served from the query cache.
+    """
+    def __init__(self, parent, dispatcher, **kw):
+        super().__init__(parent, **kw)
+        self.dispatcher = dispatcher; self._tabs = {}  # kind -> (frame, build, prefetch)
+        self._pending = []; self._prefetched = set()
+        self.bind("<<NotebookTabChanged>>", self._on_tab)
+
+    def add_lazy(self, kind, text, build, prefetch=None):
+        frame = ttk.Frame(self); self.add(frame, text=text)
+        self._tabs[kind] = (frame, build, prefetch); self._pending.append(kind)
+        return frame
+
+    def show(self, kind):
+        """Select a tab, building it now so the caller can use it straight away."""
+        self.select(self._tabs[kind][0]); self._build(kind)
+
+    def _on_tab(self, e=None):
+        for kind, (frame, build, prefetch) in self._tabs.items():
+            if str(frame) == self.select(): self._build(kind)
+
+    def _build(self, kind):
+        if kind in self._pending:
+            self._pending.remove(kind); self._tabs[kind][1](self._tabs[kind][0])
+            self.prefetch_next()
+
+    def prefetch_next(self):
+        """Warm the cache for the unbuilt tab most likely to be opened next."""
+        for kind in self._pending:
+            prefetch = self._tabs[kind][2]
+            if prefetch and kind not in self._prefetched:
+                self._prefetched.add(kind); self.dispatcher.submit(prefetch, owner=self); return
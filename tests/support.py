@@ -0,0 +1,50 @@
+"""Shared fixture of the nvit_db tests: a temporary, migrated and seeded database (no Tk needed).
+
+    python -m pytest -q tests
+"""
+import os, sys, random, sqlite3, tempfile, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import nvit_db as D
+from nvit_db import Q, LISTS, run_many
+
+BLOOD = ("A+", "B+", "O+", "AB-", None)
+FIRST = ("Karim", "Rahim", "Nusrat", "Farhana", "Tanvir", "Sadia", "Imran", "Jannat", "Arif", "Mim")
+LAST = ("Hossain", "Ahmed", "Islam", "Khan", "Chowdhury", "Sarkar", "Uddin", "Begum")
+
+
+class DBTestCase(unittest.TestCase):
+    """A fresh database per test: 3 courses, 2 instructors and 237 students (not a multiple of
+    the block size, so the last block is partial). ``open_kw`` goes to open_db()."""
+    students = 237
+    open_kw = {}
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._dir.name, "test.db")
+        m = D.open_db(self.path, **self.open_kw)
+        with m.writer() as conn: D.migrate(conn)
+        run_many(Q("courses.insert"), [("Python", "3 months", 5000), ("Java", "4 months", 6000), ("Web", "2 months", 4000)])
+        run_many(Q("instructors.insert"), [("Abdul Karim", "", "", "A+", "01711000001", "Python"),
+                                           ("Sumaiya Akter", "", "", "B+", "01711000002", "Java")])
+        rnd = random.Random(7)
+        run_many(Q("students.insert"), [
+            (f"{rnd.choice(FIRST)} {rnd.choice(LAST)}", rnd.choice(FIRST), rnd.choice(FIRST), "Dhaka",
+             BLOOD[i % len(BLOOD)], f"0181{i:07d}", (None, 1, 2, 3)[i % 4], (None, 1, 2)[i % 3], f"B{i % 6}" if i % 5 else None)
+            for i in range(self.students)])
+
+    def tearDown(self):
+        D.db().close()
+        self._dir.cleanup()
+
+    def direct(self, sql, p=()):
+        """Rows read past the app's connections and cache."""
+        with sqlite3.connect(self.path) as conn: return conn.execute(sql, p).fetchall()
+
+    def view(self, kind="students", block=10):
+        return LISTS[kind].view(block)
+
+    def all_rows(self, view):
+        total = view.count(); rows = []
+        for index in range((total + view.block - 1) // view.block): rows += view.rows(index, total)
+        return rows
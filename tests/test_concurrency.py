@@ -0,0 +1,59 @@
+import sqlite3, threading, unittest
+
+from support import DBTestCase
+import nvit_db as D
+from nvit_db import Q, fetch_all, run_query
+
+COURSE = ("Go", "1 month", 100)
+
+
+class MultiInstanceTest(DBTestCase):
+    open_kw = {"concurrent": True, "timeout": 0.05, "retries": 4, "backoff": 0.02}
+
+    def lock(self):
+        """Another instance holding the write lock until the returned connection commits."""
+        other = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self.addCleanup(other.close)
+        other.execute("BEGIN IMMEDIATE")
+        return other
+
+    def test_wal(self):
+        self.assertEqual(self.direct("PRAGMA journal_mode"), [("wal",)])
+
+    def test_lock_that_outlasts_the_retries(self):
+        self.lock()
+        with self.assertRaises(D.DatabaseBusy): run_query(Q("courses.insert"), COURSE)
+        stats = D.db().contention_stats()["courses.insert"]
+        self.assertEqual((stats["busy"], stats["retries"], stats["failures"]), (1, 4, 1))
+
+    def test_retry_after_the_lock_is_released(self):
+        other = self.lock(); threading.Timer(0.1, other.commit).start()
+        key = run_query(Q("courses.insert"), COURSE)
+        self.assertEqual(self.direct("SELECT course_name FROM Course WHERE course_id = ?", (key,)), [("Go",)])
+        stats = D.db().contention_stats()["courses.insert"]
+        self.assertGreater(stats["retries"], 0)
+        self.assertEqual(stats["failures"], 0)
+
+    def test_other_instances_writes_are_seen(self):
+        self.assertEqual(len(fetch_all(Q("courses.list"))), 3)
+        events = []
+        self.addCleanup(D.events.subscribe("Course", lambda table, key: events.append(key)))
+        with sqlite3.connect(self.path) as other: other.execute("INSERT INTO Course (course_name, duration) VALUES ('Go', '1 month')")
+        self.assertEqual(len(fetch_all(Q("courses.list"))), 4)
+        self.assertEqual(events, [None])
+        self.assertTrue(D.check_external_writes())
+        self.assertEqual(events, [None])  # nothing new since
+
+
+class SingleInstanceTest(DBTestCase):
+    open_kw = {"timeout": 0.05}
+
+    def test_no_retries(self):
+        other = sqlite3.connect(self.path, isolation_level=None); self.addCleanup(other.close)
+        other.execute("BEGIN IMMEDIATE")
+        with self.assertRaises(D.DatabaseBusy): run_query(Q("courses.insert"), COURSE)
+        self.assertEqual(D.db().contention_stats()["courses.insert"]["retries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
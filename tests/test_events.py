@@ -0,0 +1,42 @@
+import unittest
+
+from support import DBTestCase
+import nvit_db as D
+from nvit_db import Q, run_query
+
+
+class ChangeEventTest(DBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.events = []
+        for table in ("Course", "Student", "Result"):
+            self.addCleanup(D.events.subscribe(table, lambda table, key: self.events.append((table, key))))
+
+    def effects(self, sql):
+        with D.db().writer() as conn: return D.db().write_effects(conn, D.writes_of(sql))
+
+    def test_effects_follow_the_operation(self):
+        self.assertEqual(self.effects(Q["courses.insert"]), {"course"})  # no foreign-key action fires
+        self.assertEqual(self.effects(Q["courses.update"]), {"course", "student"})  # renames the course_sort copies
+        self.assertLessEqual({"course", "student", "result"}, self.effects(Q["courses.delete"]))
+        self.assertLessEqual({"student", "student_fts", "search_pending"}, self.effects(Q["students.insert"]))
+
+    def test_one_row_write_names_its_key(self):
+        key = run_query(Q("courses.insert"), ("Go", "1 month", 100))
+        self.assertEqual(self.events, [("course", key)])
+        self.events.clear()
+        run_query(Q("courses.update"), ("Golang", "1 month", 100, key))
+        self.assertEqual(sorted(self.events), [("course", key), ("student", None)])
+
+    def test_foreign_key_action_invalidates_child(self):
+        v = self.view()
+        before = v.row(4)  # course 3, by the seeding pattern
+        self.assertEqual((before[7], before[10]), ("Web", 3))
+        run_query(Q("courses.delete"), (3,))  # ON DELETE SET NULL rewrites Student rows
+        self.assertIn(("student", None), self.events)
+        after = v.row(4)
+        self.assertEqual((after[7], after[10]), (None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
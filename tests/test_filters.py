@@ -0,0 +1,49 @@
+import unittest
+
+from support import DBTestCase
+from nvit_db import ListQuery, Q
+
+
+class ColumnFilterTest(DBTestCase):
+    def test_filter(self):
+        v = self.view()
+        self.assertTrue(v.filter("s.blood_group", ["A+", ""]))
+        self.assertFalse(v.filter("s.blood_group", ["A+", ""]))
+        expected = self.direct("SELECT student_id FROM Student WHERE IFNULL(blood_group, '') IN ('A+', '') ORDER BY student_id")
+        self.assertEqual(v.count(), len(expected))
+        self.assertEqual([(r[0],) for r in self.all_rows(v)], expected)
+        v.filter("c.course_name", [2]); v.sort("s.name")
+        rows = self.all_rows(v)
+        self.assertTrue(rows)
+        self.assertTrue(all(r[5] in ("A+", None) and r[10] == 2 for r in rows))
+        self.assertEqual([r[1] for r in rows], sorted(r[1] for r in rows))
+        self.assertEqual(v.locate(rows[-1][0])[0], len(rows) - 1)
+        v.filter("s.blood_group"); v.filter("c.course_name")
+        self.assertEqual(v.count(), self.students)
+
+    def test_filter_composes_with_search(self):
+        v = self.view(); v.search("karim"); v.filter("s.blood_group", [""])
+        rows = self.all_rows(v)
+        self.assertEqual(len(rows), v.count())
+        self.assertTrue(all(r[5] is None and "karim" in " ".join(map(str, r)).lower() for r in rows))
+
+    def test_distinct(self):
+        values = {v: (label, n) for v, label, n in self.view().distinct("c.course_name")}
+        self.assertEqual(values[0][0], "(blank)")
+        self.assertEqual(values[3], ("Web", len(self.direct("SELECT 1 FROM Student WHERE course_id = 3"))))
+
+    def test_combinations_are_registered_when_used(self):
+        query = ListQuery("filter_test", ["student_id", "name"], "Student", "student_id", sorts={"name": "name"},
+                          filters={c: f"IFNULL({c}, '')" for c in ("blood_group", "batch_no", "address")})
+        names = lambda: {n for n, _ in Q.items() if n.startswith("filter_test.count")}
+        self.assertEqual(names(), {"filter_test.count"})
+        v = query.view(10); v.filter("address", ["Dhaka"]); v.filter("blood_group", ["A+"])
+        self.assertEqual(names(), {"filter_test.count", "filter_test.count.where_address",
+                                   "filter_test.count.where_blood_group_address"})
+        self.assertEqual(v.count(), len(self.direct("SELECT 1 FROM Student WHERE blood_group = 'A+'")))
+        query.where_all()
+        self.assertEqual(len(names()), 2 ** 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import sqlite3, unittest
+
+from support import DBTestCase
+from nvit_db import Q, run_query
+
+KEYS = "SELECT student_id FROM Student ORDER BY student_id"
+
+
+class ListViewTest(DBTestCase):
+    def keys(self):
+        return [k for k, in self.direct(KEYS)]
+
+    def test_pages_follow_key_order(self):
+        v = self.view()
+        self.assertEqual([r[0] for r in self.all_rows(v)], self.keys())
+        self.assertEqual(v.known(), self.students // v.block)
+
+    def test_jump_walks_to_an_unread_block(self):
+        v = self.view(); v.walk_blocks = 3; keys = self.keys()
+        self.assertEqual([r[0] for r in v.rows(17)], keys[170:180])
+        self.assertEqual(v.known(), 18)  # the walk's boundaries and the block read
+        self.assertEqual(v.rows(40), [])
+
+    def test_pages_back_from_the_end(self):
+        v = self.view(); v.walk_blocks = 3; keys = self.keys(); total = v.count()
+        last = (total - 1) // v.block
+        for index in range(last, -1, -1):  # Last, then Prev all the way back
+            self.assertEqual([r[0] for r in v.rows(index, total)], keys[index * v.block:(index + 1) * v.block], index)
+        self.assertLess(v.known(), 3)  # never walked forward from the start
+        self.assertEqual(v._back[total - last * v.block], keys[last * v.block])
+
+    def test_end_positions_are_dropped_after_a_removal(self):
+        v = self.view(); total = v.count()
+        v.rows(20, total)
+        self.assertTrue(v._back)
+        run_query(Q("students.delete"), (self.keys()[5],)); v.forget(0)
+        self.assertEqual(v._back, {})
+        total = v.count()
+        self.assertEqual([r[0] for r in v.rows(20, total)], self.keys()[200:210])
+
+    def test_locate(self):
+        v = self.view(); keys = self.keys()
+        for i in (0, 1, 99, 100, len(keys) - 1):
+            pos, row = v.locate(keys[i])
+            self.assertEqual((pos, row[0]), (i, keys[i]))
+        self.assertIsNone(v.locate(10 ** 6))
+
+    def test_cancel_stops_reads(self):
+        v = self.view(); v.cancel()
+        with self.assertRaises(sqlite3.OperationalError): v.count()
+        self.assertIsNone(v._anchor(v._state(), 5))  # and ends a walk
+
+    def test_sorted_pages(self):
+        v = self.view(); v.sort("s.name", desc=True)
+        expected = self.direct("SELECT name, student_id FROM Student ORDER BY name DESC, student_id DESC")
+        self.assertEqual([(r[1], r[0]) for r in self.all_rows(v)], expected)
+        v.sort("c.course_name")
+        names = [r[7] or "" for r in self.all_rows(v)]
+        self.assertEqual(names, sorted(names))
+        v.sort("s.batch_no"); total = v.count()
+        expected = [k for k, in self.direct("SELECT student_id FROM Student ORDER BY IFNULL(batch_no, ''), student_id")]
+        rows = [r for index in range(total // v.block, -1, -1) for r in reversed(v.rows(index, total))]
+        self.assertEqual([r[0] for r in reversed(rows)], expected)
+
+    def test_sort_copy_follows_a_rename(self):
+        v = self.view(); v.sort("c.course_name")
+        first = v.rows(0)
+        self.assertEqual(first[0][7], None)  # no course sorts first
+        run_query(Q("courses.update"), ("AAA Basics", "2 months", 4000, 3))  # renames course_sort by trigger
+        v.reset()
+        after = [r for r in self.all_rows(v) if r[7]]
+        self.assertEqual(after[0][7], "AAA Basics")
+
+    def test_read_racing_a_sort(self):
+        v = self.view(); keys = self.keys(); fetch = v._fetch
+        def racing(q, p=()):
+            v._fetch = fetch; v.sort("s.name")  # a header click while the statement runs
+            return fetch(q, p)
+        v._fetch = racing
+        self.assertEqual([r[0] for r in v.rows(0)], keys[:10])  # one consistent read in the old order
+        self.assertEqual(v.known(), 0)  # not remembered as a block of the new order
+        names = [r[1] for r in v.rows(0)]
+        self.assertEqual(names, sorted(names))
+
+    def test_abort_stops_only_the_reads_in_flight(self):
+        v = self.view(); st = v._state()
+        v.abort()
+        self.assertIsNone(v._anchor(st, 5))  # a walk that was running ends unremembered
+        self.assertEqual(v.known(), 0)
+        self.assertEqual(v.count(), self.students)  # later reads run
+        self.assertEqual([r[0] for r in v.rows(5)], self.keys()[50:60])
+
+
+if __name__ == "__main__":
+    unittest.main()
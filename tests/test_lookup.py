@@ -0,0 +1,34 @@
+import unittest
+
+from support import DBTestCase
+from nvit_db import LOOKUPS, Q, fetch_all, run_query
+
+
+class LookupTest(DBTestCase):
+    def test_search_by_prefix_and_id(self):
+        students = LOOKUPS["students"]
+        key = run_query(Q("students.insert"), ("Zubair Karimullah", "", "", "", "", "", None, None, ""))
+        self.assertEqual(students.search("zub"), [(key, "Zubair Karimullah")])
+        self.assertEqual(students.search(str(key))[0], (key, "Zubair Karimullah"))
+        self.assertEqual(students.id_of(students.label(key, "Zubair Karimullah")), key)
+        self.assertEqual(students.search("100%"), [])  # LIKE wildcards are literal
+
+    def test_search_leaves_cached_rows_alone(self):
+        students = LOOKUPS["students"]
+        by_id = fetch_all(Q("students.by_id"), (1,))
+        students.search("1")
+        self.assertEqual(len(fetch_all(Q("students.by_id"), (1,))), 1)
+        self.assertIs(fetch_all(Q("students.by_id"), (1,)), by_id)
+
+    def test_preloaded_lookup_follows_writes(self):
+        courses = LOOKUPS["courses"]
+        self.assertEqual(courses.search("ja"), [(2, "Java")])
+        run_query(Q("courses.update"), ("Javascript", "4 months", 6000, 2))
+        self.assertEqual(courses.name_of(2), "Javascript")
+        run_query(Q("courses.delete"), (2,))
+        self.assertIsNone(courses.name_of(2))
+        self.assertEqual(courses.search("ja"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
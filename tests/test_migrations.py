@@ -0,0 +1,58 @@
+import os, sqlite3, tempfile, unittest
+
+from support import D
+
+
+class MigrateTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self._dir.name, "m.db"), isolation_level=None)
+
+    def tearDown(self):
+        self.conn.close(); self._dir.cleanup()
+
+    def version(self):
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def test_fresh_database_gets_every_migration_once(self):
+        done = D.migrate(self.conn)
+        self.assertEqual([v for v, _, _ in done], [v for v, _, _ in D.MIGRATIONS])
+        self.assertEqual(self.version(), D.schema_version())
+        self.assertEqual(D.migrate(self.conn), [])  # already current: nothing runs
+        self.assertFalse(self.conn.in_transaction)
+
+    def test_newer_schema_is_refused(self):
+        self.conn.execute(f"PRAGMA user_version = {D.schema_version() + 1}")
+        with self.assertRaises(D.MigrationError): D.migrate(self.conn)
+
+    def test_failed_migration_leaves_nothing_behind(self):
+        self.conn.execute("CREATE TABLE Course (course_id INTEGER PRIMARY KEY, course_name TEXT, fee REAL)")
+        with self.assertRaises(D.MigrationError) as e: D.migrate(self.conn)
+        self.assertIn("fee", str(e.exception))
+        self.assertEqual(self.version(), 0)
+        tables = {n for n, in self.conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        self.assertEqual(tables, {"Course"})
+
+    def test_legacy_table_is_rebuilt_with_its_rows(self):
+        self.conn.executescript("""
+            CREATE TABLE course (course_id INTEGER PRIMARY KEY AUTOINCREMENT, course_name TEXT, duration TEXT);
+            INSERT INTO course VALUES (1, 'Python', '3 months'), (2, 'Java', '4 months');
+            CREATE TABLE Result (result_id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, course_id INTEGER, grade TEXT);
+            INSERT INTO Result (student_id, course_id, grade) VALUES (NULL, 2, 'A');""")
+        D.migrate(self.conn)
+        self.assertEqual(self.conn.execute("SELECT course_id, course_name, course_price FROM Course").fetchall(),
+                         [(1, "Python", None), (2, "Java", None)])
+        self.assertEqual(self.conn.execute("SELECT course_id, grade, instructor_id FROM Result").fetchall(), [(2, "A", None)])
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("DELETE FROM Course WHERE course_id = 2")  # the rebuilt parent still drives ON DELETE SET NULL
+        self.assertEqual(self.conn.execute("SELECT course_id FROM Result").fetchall(), [(None,)])
+
+    def test_copy_rows_in_batches(self):
+        self.conn.execute("CREATE TABLE a (x)"); self.conn.execute("CREATE TABLE b (x)")
+        self.conn.executemany("INSERT INTO a VALUES (?)", [(i,) for i in range(2500)])
+        self.assertEqual(D.copy_rows(self.conn, "SELECT x FROM a", "INSERT INTO b VALUES (?)", batch=1000), 2500)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*), SUM(x) FROM b").fetchone(), (2500, sum(range(2500))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import sqlite3, unittest
+from collections import Counter
+
+from support import DBTestCase
+import nvit_db as D
+from nvit_db import Q, run_query
+
+
+class NameSearchTest(DBTestCase):
+    def assertIndexCurrent(self):
+        grams = set(); counts = Counter()
+        for k, table, key in D.NAME_KINDS.values():
+            for ref, name in self.direct(f"SELECT {key}, name FROM {table}"):
+                for g in D.name_trigrams(name): grams.add((k, g, ref)); counts[k, g] += 1
+        self.assertEqual(set(self.direct("SELECT kind, gram, ref FROM name_grams")), grams)
+        self.assertEqual({(k, g): n for k, g, n in self.direct("SELECT kind, gram, n FROM name_gram_counts") if n}, dict(counts))
+        self.assertEqual(self.direct("SELECT COUNT(*) FROM search_pending"), [(0,)])
+
+    def test_index_is_built_and_kept(self):
+        self.assertIndexCurrent()
+        run_query(Q("students.insert"), ("Mohammad Zahedul Hossain", "", "", "", "", "", None, None, ""))
+        run_query("UPDATE Instructors SET name = 'Sumaiya Akhter' WHERE instructor_id = 2")
+        run_query(Q("students.delete"), (7,))
+        self.assertIndexCurrent()
+
+    def test_misspelt_names_are_found(self):
+        key = run_query(Q("students.insert"), ("Mohammad Zahedul Hossain", "", "", "", "", "", None, None, ""))
+        self.assertEqual(D.fuzzy_names("students", "Md Jahidul Hussain")[0][:2], (key, "Mohammad Zahedul Hossain"))
+        run_query("UPDATE Student SET name = 'Nafisa Tabassum' WHERE student_id = ?", (key,))
+        self.assertNotIn(key, [k for k, _, _ in D.fuzzy_names("students", "Jahidul Hossain")])
+        self.assertEqual(D.fuzzy_names("instructors", "Sumaya Akter")[0][0], 2)
+
+    def test_other_clients_can_write_names(self):
+        with sqlite3.connect(self.path) as conn:  # no app functions registered on this connection
+            conn.execute("INSERT INTO Student (name) VALUES ('Plain Client')")
+            conn.execute("UPDATE Instructors SET name = 'Renamed Teacher' WHERE instructor_id = 1")
+        D.db().cache.clear()
+        self.assertEqual(D.fuzzy_names("instructors", "Renamed Teacher")[0][0], 1)
+        self.assertIndexCurrent()
+
+    def test_normalize_name(self):
+        self.assertEqual(D.normalize_name("Mohammad Zahedul Hossain"), D.normalize_name("Md. Jahidul Hussain"))
+        self.assertEqual(D.normalize_name("Mosammat Farhana"), D.normalize_name("MST. PHARHANA"))
+        self.assertEqual(D.normalize_name("  Rahim123_Uddin!! "), "rahim udin")
+        self.assertEqual(D.normalize_name("Sheikh"), "sk")
+        self.assertEqual(D.normalize_name(None), "")
+        self.assertEqual(D.normalize_name("12 - 34"), "")
+        self.assertEqual(D.name_trigrams(""), frozenset())
+        self.assertEqual(D.name_trigrams("Al"), frozenset({" al", "al "}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import sqlite3, unittest
+
+from support import DBTestCase
+import nvit_db as D
+from nvit_db import Q, run_query
+
+
+class PhoneLookupTest(DBTestCase):
+    def test_numbers_in_any_spelling(self):
+        key = run_query(Q("students.insert"), ("Phone Owner", "", "", "", "", "+880 1799-998888", None, None, ""))
+        for text in ("01799998888", "8801799998888", "1799998888", "8888", "998888"):
+            self.assertEqual(D.find_phone(text)["students"][0], (key, "Phone Owner · +880 1799-998888"), text)
+        self.assertEqual(D.find_phone("123"), {})
+
+    def test_index_follows_writes(self):
+        run_query("UPDATE Instructors SET mobile_no = '01633332222' WHERE instructor_id = 1")
+        self.assertEqual(D.find_phone("01633332222")["instructors"][0][0], 1)
+        self.assertNotIn("instructors", D.find_phone("01711000001"))
+        run_query("UPDATE Instructors SET mobile_no = NULL WHERE instructor_id = 1")
+        self.assertEqual(self.direct("SELECT COUNT(*) FROM phones WHERE kind = 2 AND ref = 1"), [(0,)])
+
+    def test_other_clients_can_write_numbers(self):
+        with sqlite3.connect(self.path) as conn:  # no app functions registered on this connection
+            conn.execute("INSERT INTO Student (name, mobile_no) VALUES ('Plain Client', '+8801755554444')")
+            conn.execute("UPDATE Instructors SET mobile_no = '01633332222' WHERE instructor_id = 1")
+        D.db().cache.clear()
+        self.assertEqual(D.find_phone("01755554444")["students"][0][1], "Plain Client · +8801755554444")
+        self.assertEqual(D.find_phone("2222")["instructors"][0][0], 1)
+        self.assertEqual(self.direct("SELECT COUNT(*) FROM search_pending"), [(0,)])
+
+    def test_phone_key(self):
+        for text in ("01710000001", "+8801710000001", "017-1000-0001", "008801710000001", "1710000001", "+880 1710 000001"):
+            self.assertEqual(D.phone_key(text), "01710000001", text)
+        self.assertEqual(D.phone_key("ext. 4321"), "4321")
+        for text in (None, "", "n/a", "123", "+1"):
+            self.assertIsNone(D.phone_key(text), text)
+        self.assertEqual(D.phone_rev("01710000001"), "10000001710")
+        self.assertIsNone(D.phone_rev("12"))
+
+
+if __name__ == "__main__":
+    unittest.main()
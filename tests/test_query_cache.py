@@ -0,0 +1,51 @@
+import unittest
+
+from support import DBTestCase
+import nvit_db as D
+from nvit_db import Q, QueryCache, fetch_all, run_query
+
+
+class QueryCacheTest(DBTestCase):
+    def test_write_invalidates_what_it_read(self):
+        q = Q("courses.list")
+        rows = fetch_all(q)
+        self.assertIsInstance(rows, tuple)
+        self.assertIs(fetch_all(q), rows)  # served from the cache
+        run_query(Q("courses.update"), ("Python 3", "3 months", 5500, 1))
+        self.assertEqual(fetch_all(q)[0][1], "Python 3")
+
+    def test_write_keeps_other_tables(self):
+        courses = fetch_all(Q("courses.list")); instructors = fetch_all(Q("instructors.list"))
+        run_query(Q("instructors.update"), ("Abdul Karim", "", "", "O+", "01711000001", "Python", 1))
+        self.assertIs(fetch_all(Q("courses.list")), courses)
+        self.assertIsNot(fetch_all(Q("instructors.list")), instructors)
+
+
+class CacheBudgetTest(unittest.TestCase):
+    rows = tuple((i, "x" * 40) for i in range(20))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        size = D._sizeof(self.rows); cache = QueryCache(max_bytes=size * 4)
+        for i in range(4): cache.put(i, self.rows, {"t"}, cache.generation({"t"}))
+        cache.get(0)  # now the most recently used
+        cache.put(4, self.rows, {"t"}, cache.generation({"t"}))
+        self.assertLessEqual(cache.bytes, cache.max_bytes)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertIs(cache.get(1), D._MISS)
+        self.assertIs(cache.get(0), self.rows)
+
+    def test_oversized_result_is_not_cached(self):
+        cache = QueryCache(max_bytes=D._sizeof(self.rows) * 3)
+        cache.put("big", self.rows, {"t"}, cache.generation({"t"}))
+        self.assertIs(cache.get("big"), D._MISS)
+        self.assertEqual(cache.bytes, 0)
+
+    def test_read_racing_a_write_is_not_cached(self):
+        cache = QueryCache(); gen = cache.generation({"t"})
+        cache.invalidate({"t"})  # a write lands while the read runs
+        cache.put("k", self.rows, {"t"}, gen)
+        self.assertIs(cache.get("k"), D._MISS)
+
+
+if __name__ == "__main__":
+    unittest.main()
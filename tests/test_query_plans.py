@@ -0,0 +1,31 @@
+import unittest
+
+from support import DBTestCase
+import nvit_db as D
+
+
+class QueryPlanTest(DBTestCase):
+    def check(self, registry=D.Q, threshold=100):
+        with D.db().writer() as conn: return D.check_query_plans(conn, threshold, registry)
+
+    def test_app_statements_use_indexes(self):
+        self.assertEqual(self.check(), [])
+
+    def test_full_scans_are_reported(self):
+        r = D.QueryRegistry()
+        r.register("by_father", "SELECT student_id FROM Student WHERE father_name = ?")
+        r.register("by_father.ok", "SELECT student_id FROM Student WHERE father_name = ?", scan_ok=True)
+        r.register("father_order", "SELECT student_id FROM Student ORDER BY father_name LIMIT ?")  # sorts every row
+        r.register("name_order", "SELECT student_id FROM Student ORDER BY name LIMIT ?")  # walks idx_student_name
+        self.assertEqual([name for name, _ in self.check(r)], ["by_father", "father_order"])
+        self.assertEqual(self.check(r, threshold=1000), [])
+
+    def test_missing_index_is_reported(self):
+        with D.db().writer() as conn: conn.execute("DROP INDEX idx_result_student")
+        problems = dict(self.check(D.QueryRegistry()))
+        self.assertIn("idx_result_student", problems)
+        self.assertIn("Result.student_id", problems)  # and the foreign key it covered
+
+
+if __name__ == "__main__":
+    unittest.main()
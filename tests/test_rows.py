@@ -0,0 +1,36 @@
+import csv, os, unittest
+
+from support import DBTestCase
+import nvit_db as D
+from nvit_db import fetch_all, iter_batches, iter_rows, export_csv
+
+SQL = "SELECT student_id, name, mobile_no FROM Student ORDER BY student_id"
+
+
+class StreamingTest(DBTestCase):
+    def test_iter_rows_matches_fetch_all(self):
+        self.assertEqual(tuple(iter_rows(SQL, batch=50)), fetch_all(SQL))
+
+    def test_batches_hold_at_most_batch_rows(self):
+        self.assertEqual([len(b) for b in iter_batches(SQL, batch=100)], [100, 100, 37])
+
+    def test_closing_early_returns_the_reader(self):
+        for _ in range(5):  # more abandoned iterators than the pool has readers
+            it = iter_rows(SQL, batch=10); next(it); it.close()
+        self.assertEqual(len(fetch_all(SQL)), self.students)
+
+    def test_export_csv(self):
+        path = os.path.join(self._dir.name, "students.csv")
+        self.assertEqual(export_csv(path, SQL, header=("id", "name", "mobile"), batch=64), self.students)
+        with open(path, newline="", encoding="utf-8") as fh: rows = list(csv.reader(fh))
+        self.assertEqual(rows[0], ["id", "name", "mobile"])
+        self.assertEqual(rows[1:], [[str(k), n, m] for k, n, m in fetch_all(SQL)])
+
+    def test_stream_is_traced_once(self):
+        before = dict((name, n) for name, n, *_ in D.db().tracer.summary()).get(SQL, 0)
+        for _ in iter_rows(SQL, batch=10): pass
+        self.assertEqual(dict((name, n) for name, n, *_ in D.db().tracer.summary())[SQL], before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
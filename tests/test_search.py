@@ -0,0 +1,56 @@
+import unittest
+
+from support import DBTestCase
+import nvit_db as D
+from nvit_db import Q, RANK, run_query
+
+NEW = ("Zubair Karimullah", "", "", "", "", "", None, None, "")
+
+
+class FullTextSearchTest(DBTestCase):
+    def matches(self, text):
+        v = self.view(); v.search(text)
+        return [r[0] for r in self.all_rows(v)]
+
+    def test_search_ranks_name_hits_first(self):
+        a = run_query(Q("students.insert"), NEW)
+        b = run_query(Q("students.insert"), ("Someone Else", "Zubair", "", "", "", "", None, None, ""))
+        v = self.view()
+        self.assertTrue(v.search("zuba"))
+        self.assertEqual(v.sort_col, RANK)
+        self.assertEqual([r[0] for r in self.all_rows(v)], [a, b])
+        v.sort("s.name")  # a header sort during a search keeps the matches
+        self.assertEqual([r[0] for r in self.all_rows(v)], [b, a])
+        self.assertTrue(v.search(""))
+        self.assertEqual(v.sort_col, "s.name")
+        self.assertEqual(v.count(), self.students + 2)
+
+    def test_search_sort_cleared_with_search(self):
+        v = self.view(); v.search("karim")
+        self.assertTrue(all("karim" in " ".join(map(str, r)).lower() for r in self.all_rows(v)))
+        v.search("")
+        self.assertIsNone(v.sort_col)
+        self.assertFalse(v.search("  "))
+
+    def test_index_follows_writes(self):
+        key = run_query(Q("students.insert"), NEW)
+        self.assertEqual(self.matches("karimul"), [key])
+        run_query("UPDATE Student SET address = 'Khulna' WHERE student_id = ?", (key,))
+        self.assertEqual(self.matches("karimul"), [key])
+        self.assertEqual(self.matches("khulna"), [key])
+        run_query("UPDATE Student SET name = 'Nafisa Tabassum' WHERE student_id = ?", (key,))
+        self.assertEqual(self.matches("karimul"), [])
+        run_query(Q("students.delete"), (key,))
+        self.assertEqual(self.matches("khulna"), [])
+        self.assertEqual(self.direct("INSERT INTO student_fts(student_fts, rank) VALUES ('integrity-check', 1)"), [])
+
+    def test_fts_query(self):
+        self.assertEqual(D.fts_query("md rahim"), '"md"* "rahim"*')
+        self.assertEqual(D.fts_query('say "hi" NOT OR'), '"say"* "hi"* "NOT"* "OR"*')  # operators become words
+        self.assertEqual(D.fts_query("a-b*c"), '"a"* "b"* "c"*')
+        self.assertIsNone(D.fts_query(""))
+        self.assertIsNone(D.fts_query(' *"- '))
+
+
+if __name__ == "__main__":
+    unittest.main()
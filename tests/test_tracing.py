@@ -0,0 +1,43 @@
+import io, logging, os, tempfile, unittest
+from contextlib import redirect_stderr
+
+from support import D
+from nvit_db import Tracer, slow_log_summary
+
+
+class TracerTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.log = os.path.join(self._dir.name, "slow.log")
+
+    def tearDown(self):
+        for h in [h for h in D.slow_sql_log.handlers if isinstance(h, logging.FileHandler)]:
+            D.slow_sql_log.removeHandler(h); h.close()
+        self._dir.cleanup()
+
+    def test_summary_by_statement(self):
+        t = Tracer(slow_ms=10 ** 6)
+        for ms in range(1, 101): t.record(D.Q["courses.list"], ms / 1000)
+        t.record("SELECT 1", 0.5)
+        (name, n, p50, p95, p99, mx), other = t.summary()
+        self.assertEqual((name, n, p50, p95, p99, mx), ("SELECT 1", 1, 500, 500, 500, 500))
+        self.assertEqual(other[:2], ("courses.list", 100))
+        self.assertAlmostEqual(other[2], 50); self.assertAlmostEqual(other[3], 95); self.assertAlmostEqual(other[5], 100)
+
+    def test_slow_log(self):
+        t = Tracer(slow_ms=100, slow_log=self.log)
+        t.record(D.Q["courses.list"], 0.05)  # under slow_ms: summary only
+        t.record(D.Q["courses.list"], 0.2); t.record(D.Q["courses.list"], 0.4)
+        rows = slow_log_summary(self.log)
+        self.assertEqual([r[:2] for r in rows], [("courses.list", 2)])
+        self.assertAlmostEqual(rows[0][5], 400)
+        self.assertEqual(t.summary()[0][1], 3)
+
+    def test_no_slow_log_prints_nothing(self):
+        err = io.StringIO()
+        with redirect_stderr(err): Tracer(slow_ms=0).record("SELECT 1", 0.5)
+        self.assertEqual(err.getvalue(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import sqlite3, unittest
+
+from support import DBTestCase
+import nvit_db as D
+from nvit_db import Q, UnitOfWork, fetch_all, run_query, transaction
+
+COUNT = "SELECT COUNT(*) FROM Course"
+
+
+class TransactionTest(DBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.events = []
+        self.addCleanup(D.events.subscribe("Course", lambda table, key: self.events.append(key)))
+
+    def courses(self):
+        return fetch_all(COUNT)[0][0]
+
+    def test_commit_publishes_once(self):
+        with transaction() as tx:
+            tx.execute(Q("courses.insert"), ("Go", "1 month", 100))
+            tx.execute(Q("courses.insert"), ("Rust", "1 month", 100))
+            self.assertEqual(self.events, [])
+        self.assertEqual(self.courses(), 5)
+        self.assertEqual(self.events, [None])
+
+    def test_error_rolls_everything_back(self):
+        self.courses()  # cached before the failed write
+        with self.assertRaises(ZeroDivisionError):
+            with transaction() as tx:
+                tx.execute(Q("courses.insert"), ("Go", "1 month", 100)); 1 / 0
+        self.assertEqual(self.courses(), 3)
+        self.assertEqual(self.direct(COUNT), [(3,)])
+        self.assertEqual(self.events, [])
+
+    def test_savepoint_rolls_back_only_its_block(self):
+        with transaction() as tx:
+            tx.execute(Q("courses.insert"), ("Go", "1 month", 100))
+            with self.assertRaises(sqlite3.IntegrityError):
+                with tx.savepoint():
+                    tx.execute(Q("courses.insert"), ("Rust", "1 month", 100))
+                    tx.execute(Q("courses.insert"), ("Python", "1 month", 100))  # course_name is UNIQUE
+        self.assertEqual([n for n, in self.direct("SELECT course_name FROM Course ORDER BY course_id")],
+                         ["Python", "Java", "Web", "Go"])
+
+    def test_nested_transaction_is_a_savepoint(self):
+        with transaction():
+            run_query(Q("courses.insert"), ("Go", "1 month", 100))
+            with self.assertRaises(RuntimeError):
+                with transaction():
+                    run_query(Q("courses.insert"), ("Rust", "1 month", 100)); raise RuntimeError
+        self.assertEqual(self.direct(COUNT), [(4,)])
+
+    def test_run_query_joins_the_open_transaction(self):
+        with self.assertRaises(RuntimeError):
+            with transaction():
+                key = run_query(Q("courses.insert"), ("Go", "1 month", 100))
+                self.assertEqual(key, 4)
+                self.assertEqual(self.events, [])  # nothing is published before the commit
+                raise RuntimeError
+        self.assertEqual(self.events, [])
+        self.assertEqual(self.direct(COUNT), [(3,)])
+
+    def test_unit_of_work(self):
+        with UnitOfWork() as uow:
+            for name in ("Go", "Rust", "C"): uow.add(Q("courses.insert"), (name, "1 month", 100))
+            uow.add(Q("courses.delete"), (2,))
+            self.assertEqual(len(uow), 4)
+        self.assertEqual([n for n, in self.direct("SELECT course_name FROM Course ORDER BY course_id")],
+                         ["Python", "Web", "Go", "Rust", "C"])
+        with self.assertRaises(KeyError):
+            with UnitOfWork() as uow:
+                uow.add(Q("courses.delete"), (1,)); raise KeyError
+        self.assertEqual(self.direct(COUNT), [(5,)])
+
+
+if __name__ == "__main__":
+    unittest.main()